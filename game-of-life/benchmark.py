@@ -0,0 +1,145 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import os
+import random
+import sys
+
+from lifegame import LifeGame
+
+sys.path.append("../worker")
+try:
+    from benchmarking import Benchmark, main
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from benchmarking import Benchmark, main
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmark_baseline.json')
+
+SIZES = (8, 29, 64)
+TURNS = 80
+SIM_STEPS = 10
+SEED = 42
+
+
+def new_game(size, turns=TURNS, sim_steps=SIM_STEPS):
+    map_text = 'players 2\nrows %d\ncols %d\n' % (size, size)
+    map_text += ''.join('m %s\n' % ('-' * size) for _ in range(size))
+    return LifeGame({
+        'map': map_text,
+        'turns': turns,
+        'sim_steps': sim_steps,
+        'loadtime': 3000,
+        'turntime': 1000,
+        'engine_seed': SEED,
+        'player_seed': SEED,
+    })
+
+
+def scripted_moves(size, count):
+    """ Same random moves for every run, one per turn """
+    rnd = random.Random(SEED)
+    cells = [(row, col) for row in range(size) for col in range(size)]
+    rnd.shuffle(cells)
+    return ['%d %d' % cell for cell in cells[:count]]
+
+
+def populated_game(size):
+    """ Game with every fifth cell alive, owned by both players """
+    game = new_game(size)
+    rnd = random.Random(SEED)
+    for row in range(size):
+        for col in range(size):
+            if rnd.random() < 0.2:
+                game.map[row][col] = rnd.randint(0, 1)
+    return game, [row[:] for row in game.map]
+
+
+def simulate_setup(size):
+    return lambda: populated_game(size)
+
+
+def simulate_run(state):
+    game, start_map = state
+    game.map = [row[:] for row in start_map]
+    game.simulate(1)
+
+
+def orders_setup(size):
+    def setup():
+        game, _ = populated_game(size)
+        lines = scripted_moves(size, 50)
+        lines += ['%d' % size, 'a b', '%d %d' % (size, size)]  # invalid orders
+        return game, lines
+    return setup
+
+
+def orders_run(state):
+    game, lines = state
+    orders, valid, ignored, invalid = game.parse_orders(0, lines)
+    game.validate_orders(0, orders, valid, ignored, invalid)
+
+
+def do_orders_setup(size):
+    def setup():
+        game = new_game(size)
+        game.start_turn()
+        game.orders[0] = [(row, col) for row, col in
+                          (map(int, line.split()) for line in scripted_moves(size, 1))]
+        return game
+    return setup
+
+
+def do_orders_run(game):
+    game.cells = {}
+    game.do_orders()
+
+
+def player_state_setup(size):
+    return lambda: populated_game(size)[0]
+
+
+def player_state_run(game):
+    game.get_player_state(0)
+
+
+def game_setup(size):
+    # small maps run out of empty cells before the turn limit
+    turns = min(TURNS, size * size)
+    return lambda: (size, scripted_moves(size, turns))
+
+
+def game_run(state):
+    """ Whole game as the engine drives it, without bots """
+    size, moves = state
+    game = new_game(size, len(moves))
+    game.start_game()
+    for turn in range(len(moves)):
+        game.start_turn()
+        for player in range(game.num_players):
+            if game.is_his_turn(player):
+                game.do_moves(player, [moves[turn]])
+        game.finish_turn()
+        if game.game_over():
+            break
+    game.finish_game()
+
+
+BENCHMARKS = []
+for size in SIZES:
+    BENCHMARKS += [
+        Benchmark('simulate/%d' % size, simulate_setup(size), simulate_run),
+        Benchmark('orders/%d' % size, orders_setup(size), orders_run),
+        Benchmark('do_orders/%d' % size, do_orders_setup(size), do_orders_run),
+        Benchmark('player_state/%d' % size, player_state_setup(size), player_state_run),
+        Benchmark('game/%d' % size, game_setup(size), game_run),
+    ]
+
+if __name__ == "__main__":
+    sys.exit(main(BENCHMARKS, BASELINE, sys.argv[1:]))
@@ -19,6 +19,77 @@ PLAYER_CELL = 'wb'
 MAP_OBJECT = '-'
 MAP_RENDER = PLAYER_CELL + MAP_OBJECT
 
+def get_default_map():
+    return {
+        'size':        (29, 29),
+        'num_players': 2,
+        'cells':       []
+    }
+
+def parse_map(map_text, scenario=False):
+    """ Parse the map_text into a more friendly data structure """
+    if map_text is None:
+        return get_default_map()
+
+    cell_owners = None
+    width = height = None
+    cells = defaultdict(list)
+    row = 0
+    num_players = None
+    char_empty = '-'
+
+    for line in map_text.split('\n'):
+        line = line.strip()
+
+        # ignore blank lines and comments
+        if not line or line[0] == '#':
+            continue
+
+        key, value = line.split(' ', 1)
+        key = key.lower()
+        if key == 'cols':
+            width = int(value)
+        elif key == 'rows':
+            height = int(value)
+        elif key == 'players':
+            num_players = int(value)
+            if num_players < 1 or num_players > 2:
+                raise Exception("map",
+                                "player count must be 1 or 2")
+        elif key == 'm':
+            if cell_owners is None:
+                if num_players is None:
+                    raise Exception("map",
+                                    "players count expected before map lines")
+                cell_owners = ['w', 'b'][:num_players]
+            if len(value) != width:
+                raise Exception("map",
+                                "Incorrect number of cols in row %s. "
+                                "Got %s, expected %s."
+                                %(row, len(value), width))
+            for col, c in enumerate(value):
+                if c in cell_owners:
+                    cells[cell_owners.index(c)].append((row,col))
+                elif c != char_empty:
+                    raise Exception("map",
+                                    "Invalid character in map: %s" % c)
+            row += 1
+    if height != row:
+        raise Exception("map",
+                        "Incorrect number of rows.  Expected %s, got %s"
+                        % (height, row))
+
+    # look for alive cells to invalidate map for a game
+    if not scenario and len(cells) > 0:
+        raise Exception("map",
+                        "Only scenarios support alive cells in map files")
+
+    return {
+        'size':        (height, width),
+        'num_players': num_players,
+        'cells':       cells
+    }
+
 class LifeGame(Game):
     def __init__(self, options=None):
         # setup options
@@ -36,7 +107,9 @@ class LifeGame(Game):
         
         self.scenario = options.get('scenario', False)
         
-        map_data = self.parse_map(map_text)
+        # maps parsed in advance (e.g. by a map corpus) are used as is
+        map_data = options.get('map_data') or self.parse_map(map_text)
+        self.map_data = map_data
         
         self.turn = 0
         self.num_players = map_data["num_players"]
@@ -89,83 +162,20 @@ class LifeGame(Game):
         self.orders = [[] for i in range(self.num_players)]
         
     def get_default_map(self):
-        return {
-            'size':        (29, 29),
-            'num_players': 2,
-            'cells':       []
-        }
+        return get_default_map()
 
     def parse_map(self, map_text):
         """ Parse the map_text into a more friendly data structure """
-        if map_text is None:
-            return self.get_default_map()
-        
-        cell_owners = None
-        width = height = None
-        cells = defaultdict(list)
-        row = 0
-        num_players = None
-        char_empty = '-'
-
-        for line in map_text.split('\n'):
-            line = line.strip()
-
-            # ignore blank lines and comments
-            if not line or line[0] == '#':
-                continue
+        return parse_map(map_text, self.scenario)
 
-            key, value = line.split(' ', 1)
-            key = key.lower()
-            if key == 'cols':
-                width = int(value)
-            elif key == 'rows':
-                height = int(value)
-            elif key == 'players':
-                num_players = int(value)
-                if num_players < 1 or num_players > 2:
-                    raise Exception("map",
-                                    "player count must be 1 or 2")
-            elif key == 'm':
-                if cell_owners is None:
-                    if num_players is None:
-                        raise Exception("map",
-                                        "players count expected before map lines")
-                    cell_owners = ['w', 'b'][:num_players]
-                if len(value) != width:
-                    raise Exception("map",
-                                    "Incorrect number of cols in row %s. "
-                                    "Got %s, expected %s."
-                                    %(row, len(value), width))
-                for col, c in enumerate(value):
-                    if c in cell_owners:
-                        cells[cell_owners.index(c)].append((row,col))
-                    elif c != char_empty:
-                        raise Exception("map",
-                                        "Invalid character in map: %s" % c)
-                row += 1
-        if height != row:
-            raise Exception("map",
-                            "Incorrect number of rows.  Expected %s, got %s"
-                            % (height, row))
-
-        # look for alive cells to invalidate map for a game
-        if not self.scenario and len(cells) > 0:
-            raise Exception("map", 
-                            "Only scenarios support alive cells in map files" % hill)
-
-        return {
-            'size':        (height, width),
-            'num_players': num_players,
-            'cells':       cells
-        }
-        
     def get_map_output(self):
         result = []
         for row in self.original_map:
             result.append(''.join([MAP_RENDER[col] for col in row]))
         return result
         
-    def cnt_neighs(self, (row, col)):
+    def cnt_neighs(self, loc):
+        row, col = loc
         neighs = [(dx, dy) for dx in (-1,0,1) for dy in (-1,0,1) 
                  if not dx == dy == 0] # do not add original cell to its neigbours
                  
@@ -447,6 +457,16 @@ class LifeGame(Game):
         replay['cutoff'] =  self.cutoff
         
         return replay
+
+    def get_replay_orders(self, replay):
+        """ Rebuild orders of every turn from a replay made by get_replay
+
+            Used to re-simulate stored games without launching bots
+        """
+        orders = defaultdict(list)
+        for row, col, turn, owner in replay['cells']:
+            orders[turn].append((owner, [(row, col)]))
+        return orders
         
 class Cell:
     def __init__(self, loc, owner, spawn_turn=None):
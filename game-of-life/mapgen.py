@@ -0,0 +1,153 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import os
+import random
+import sys
+from optparse import OptionParser
+
+from lifegame import parse_map, PLAYER_CELL, MAP_OBJECT
+
+sys.path.append("../worker")
+try:
+    from mapcorpus import load_corpus
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from mapcorpus import load_corpus
+
+
+def generate_map(rows, cols, cells=0, symmetric=True):
+    """ Generate map text for a 2 player game
+
+        Without cells the map is empty, as used by normal games.
+        Scenarios get the given number of alive cells for every player,
+        symmetric maps mirror first player cells through the map center.
+    """
+    grid = [[MAP_OBJECT] * cols for _ in range(rows)]
+    empty = [(row, col) for row in range(rows) for col in range(cols)]
+    random.shuffle(empty)
+    placed = [0, 0]
+    for row, col in empty:
+        if placed[0] >= cells and placed[1] >= cells:
+            break
+        if grid[row][col] != MAP_OBJECT:
+            continue
+        if symmetric:
+            mirror = (rows - 1 - row, cols - 1 - col)
+            if mirror == (row, col) or grid[mirror[0]][mirror[1]] != MAP_OBJECT:
+                continue
+            grid[row][col] = PLAYER_CELL[0]
+            grid[mirror[0]][mirror[1]] = PLAYER_CELL[1]
+            placed = [placed[0] + 1, placed[1] + 1]
+        else:
+            player = 0 if placed[0] <= placed[1] else 1
+            grid[row][col] = PLAYER_CELL[player]
+            placed[player] += 1
+
+    lines = ['players 2', 'rows %s' % rows, 'cols %s' % cols]
+    lines += ['m %s' % ''.join(row) for row in grid]
+    return '\n'.join(lines) + '\n'
+
+
+def validate_map(map_data, turns=80, scenario=False):
+    """ Returns a list of problems that make the map unfit for play """
+    errors = []
+    height, width = map_data['size']
+    cells = map_data['cells'] or {}
+    if map_data['num_players'] != 2:
+        errors.append('map must be for 2 players')
+    if height < 3 or width < 3:
+        errors.append('map must be at least 3x3')
+    alive = sum(len(player_cells) for player_cells in cells.values())
+    if height * width - alive < turns:
+        errors.append('%s empty cells for %s turns' % (height * width - alive, turns))
+    if scenario:
+        counts = [len(cells.get(player, [])) for player in range(2)]
+        if not all(counts):
+            errors.append('scenario must have alive cells for both players')
+        elif counts[0] != counts[1]:
+            errors.append('unfair scenario, players have %s and %s cells' % tuple(counts))
+    return errors
+
+
+def main(argv):
+    usage = ("Usage: %prog [options] generate\n"
+             "       %prog [options] validate map_file_or_dir ...")
+    parser = OptionParser(usage=usage)
+    parser.add_option("-n", "--count", dest="count", default=1, type="int",
+                      help="Number of maps to generate")
+    parser.add_option("--rows", dest="rows", default=29, type="int")
+    parser.add_option("--cols", dest="cols", default=29, type="int")
+    parser.add_option("--cells", dest="cells", default=0, type="int",
+                      help="Alive cells for every player, makes a scenario map")
+    parser.add_option("--asymmetric", dest="symmetric",
+                      action="store_false", default=True,
+                      help="Place scenario cells randomly instead of mirroring them")
+    parser.add_option("-t", "--turns", dest="turns", default=80, type="int",
+                      help="Number of turns the maps are played for")
+    parser.add_option("--scenario", dest="scenario",
+                      action="store_true", default=False,
+                      help="Validate maps as scenarios")
+    parser.add_option("-o", "--output_dir", dest="output_dir", default="maps",
+                      help="Directory to write generated maps to")
+    parser.add_option("--seed", dest="seed", default=None, type="int")
+    (opts, args) = parser.parse_args(argv)
+    if not args or args[0] not in ('generate', 'validate'):
+        parser.print_help()
+        return -1
+    random.seed(opts.seed)
+    scenario = opts.scenario or opts.cells > 0
+
+    if args[0] == 'generate':
+        if not os.path.exists(opts.output_dir):
+            os.makedirs(opts.output_dir)
+        generated = 0
+        while generated < opts.count:
+            text = generate_map(opts.rows, opts.cols, opts.cells, opts.symmetric)
+            if validate_map(parse_map(text, scenario), opts.turns, scenario):
+                continue
+            name = 'life_%dx%d_%03d.map' % (opts.rows, opts.cols, generated)
+            with open(os.path.join(opts.output_dir, name), 'w') as map_file:
+                map_file.write(text)
+            generated += 1
+            print(name)
+        # parse new maps into the corpus cache right away
+        load_corpus(opts.output_dir, lambda text: parse_map(text, scenario),
+                    'scenario' if scenario else 'corpus')
+        return 0
+
+    failed = 0
+    for path in args[1:]:
+        if os.path.isdir(path):
+            try:
+                corpus = load_corpus(path, lambda text: parse_map(text, scenario),
+                                     'scenario' if scenario else 'corpus')
+            except Exception as e:
+                print('%s: %s' % (path, e))
+                failed += 1
+                continue
+            maps = [(os.path.join(path, name), corpus.maps[name])
+                    for name in corpus.names]
+        else:
+            try:
+                with open(path, 'r') as map_file:
+                    maps = [(path, parse_map(map_file.read(), scenario))]
+            except Exception as e:
+                print('%s: %s' % (path, e))
+                failed += 1
+                continue
+        for map_path, map_data in maps:
+            errors = validate_map(map_data, opts.turns, scenario)
+            if errors:
+                failed += 1
+                print('%s: %s' % (map_path, '; '.join(errors)))
+    print('%d invalid maps' % failed)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import os
+import random
+import sys
+
+from lightsgame import LightsOut, ON
+
+sys.path.append("../worker")
+try:
+    from benchmarking import Benchmark, main
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from benchmarking import Benchmark, main
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmark_baseline.json')
+
+SIZES = (8, 16, 32)
+SEED = 42
+
+
+def map_text(size):
+    """ Same random map for every run, half of the cells are ON """
+    rnd = random.Random(SEED)
+    text = 'players 2\nrows %d\ncols %d\n' % (size, size)
+    for _ in range(size):
+        text += 'm %s\n' % ''.join(rnd.choice('01') for _ in range(size))
+    return text
+
+
+def new_game(text, turns=80):
+    return LightsOut({
+        'map': text,
+        'turns': turns,
+        'sim_steps': 0,
+        'loadtime': 3000,
+        'turntime': 1000,
+        'engine_seed': SEED,
+        'player_seed': SEED,
+    })
+
+
+def on_cells(game):
+    return [(row, col) for row in range(game.height) for col in range(game.width)
+            if game.map[row][col] == ON]
+
+
+def parse_map_setup(size):
+    return lambda: (new_game(map_text(size)), map_text(size))
+
+
+def parse_map_run(state):
+    game, text = state
+    game.parse_map(text)
+
+
+def orders_setup(size):
+    def setup():
+        game = new_game(map_text(size))
+        lines = ['%d %d' % cell for cell in on_cells(game)[:50]]
+        lines += ['%d' % size, 'a b', '%d %d' % (size, size)]  # invalid orders
+        return game, lines
+    return setup
+
+
+def orders_run(state):
+    game, lines = state
+    orders, valid, ignored, invalid = game.parse_orders(1, lines)
+    game.validate_orders(1, orders, valid, ignored, invalid)
+
+
+def do_orders_setup(size):
+    def setup():
+        game = new_game(map_text(size))
+        game.start_turn()
+        game.orders[1] = on_cells(game)[:1]
+        return game
+    return setup
+
+
+def do_orders_run(game):
+    # the same move twice leaves the map as it was
+    game.do_orders()
+    game.do_orders()
+    del game.changes[:]
+
+
+def player_state_setup(size):
+    return lambda: new_game(map_text(size))
+
+
+def player_state_run(game):
+    game.get_player_state(1)
+
+
+def game_setup(size):
+    """ Script of a game where players always switch the first ON cell,
+        that solves any map.
+    """
+    def setup():
+        text = map_text(size)
+        game = new_game(text, turns=size * size)
+        moves = []
+        while on_cells(game):
+            game.turn += 1
+            game.orders[game.turn % 2] = on_cells(game)[:1]
+            game.do_orders()
+            moves.append('%d %d' % game.orders[game.turn % 2][0])
+        return text, moves
+    return setup
+
+
+def game_run(state):
+    """ Whole game as the engine drives it, without bots """
+    text, moves = state
+    game = new_game(text, turns=len(moves))
+    game.start_game()
+    for turn in range(game.turns):
+        game.start_turn()
+        for player in range(game.num_players):
+            if game.is_his_turn(player):
+                game.do_moves(player, [moves[turn]])
+        game.finish_turn()
+        if game.game_over():
+            break
+    game.finish_game()
+
+
+BENCHMARKS = []
+for size in SIZES:
+    BENCHMARKS += [
+        Benchmark('parse_map/%d' % size, parse_map_setup(size), parse_map_run),
+        Benchmark('orders/%d' % size, orders_setup(size), orders_run),
+        Benchmark('do_orders/%d' % size, do_orders_setup(size), do_orders_run),
+        Benchmark('player_state/%d' % size, player_state_setup(size), player_state_run),
+        Benchmark('game/%d' % size, game_setup(size), game_run),
+    ]
+
+if __name__ == "__main__":
+    sys.exit(main(BENCHMARKS, BASELINE, sys.argv[1:]))
@@ -0,0 +1,22 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import os
+import sys
+
+from lightsgame import LightsOut
+
+sys.path.append("../worker")
+try:
+    from replaycheck import main
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from replaycheck import main
+
+if __name__ == "__main__":
+    sys.exit(main(LightsOut, sys.argv[1:]))
@@ -78,3 +78,8 @@ class Game:
     # used for getting a compact replay of the game
     def get_replay(self):
         pass
+
+    # used to rebuild player orders from a replay, without bots
+    def get_replay_orders(self, replay):
+        # returns {turn: [(player, orders)]}
+        pass
@@ -15,6 +15,59 @@ OFF = 0
 ON = 1
 
 
+def parse_map(map_text):
+    """ Parse the map_text into a more friendly data structure """
+    width = height = None
+    row = 0
+    num_players = None
+    cell_states = [ON, OFF]
+    on_cells = []
+
+    for line in map_text.split('\n'):
+        line = line.strip()
+
+        # ignore blank lines and comments
+        if not line or line[0] == '#':
+            continue
+
+        key, value = line.split(' ', 1)
+        key = key.lower()
+        if key == 'cols':
+            width = int(value)
+        elif key == 'rows':
+            height = int(value)
+        elif key == 'players':
+            num_players = int(value)
+            if num_players < 1 or num_players > 2:
+                raise Exception("map",
+                                "player count must be 1 or 2")
+        elif key == 'm':
+            if num_players is None:
+                raise Exception("map",
+                                "players count expected before map lines")
+            if len(value) != width:
+                raise Exception("map",
+                                "Incorrect number of cols in row %s. "
+                                "Got %s, expected %s."
+                                % (row, len(value), width))
+            for col, c in enumerate(value):
+                if int(c) == ON:
+                    on_cells.append((row, col))
+                elif int(c) not in cell_states:
+                    raise Exception("map",
+                                    "Invalid character in map: %s" % c)
+            row += 1
+    if height != row:
+        raise Exception("map",
+                        "Incorrect number of rows.  Expected %s, got %s"
+                        % (height, row))
+    return {
+        'size': (height, width),
+        'num_players': num_players,
+        'on_cells': on_cells
+    }
+
+
 class LightsOut(Game):
     def __init__(self, options=None):
         # setup options
@@ -32,7 +85,9 @@ class LightsOut(Game):
 
         self.scenario = options.get('scenario', False)
 
-        map_data = self.parse_map(map_text)
+        # maps parsed in advance (e.g. by a map corpus) are used as is
+        map_data = options.get('map_data') or self.parse_map(map_text)
+        self.map_data = map_data
 
         self.turn = 0
         self.num_players = map_data["num_players"]
@@ -82,55 +137,7 @@ class LightsOut(Game):
 
     def parse_map(self, map_text):
         """ Parse the map_text into a more friendly data structure """
-        width = height = None
-        row = 0
-        num_players = None
-        cell_states = [ON, OFF]
-        on_cells = []
-
-        for line in map_text.split('\n'):
-            line = line.strip()
-
-            # ignore blank lines and comments
-            if not line or line[0] == '#':
-                continue
-
-            key, value = line.split(' ', 1)
-            key = key.lower()
-            if key == 'cols':
-                width = int(value)
-            elif key == 'rows':
-                height = int(value)
-            elif key == 'players':
-                num_players = int(value)
-                if num_players < 1 or num_players > 2:
-                    raise Exception("map",
-                                    "player count must be 1 or 2")
-            elif key == 'm':
-                if num_players is None:
-                    raise Exception("map",
-                                    "players count expected before map lines")
-                if len(value) != width:
-                    raise Exception("map",
-                                    "Incorrect number of cols in row %s. "
-                                    "Got %s, expected %s."
-                                    % (row, len(value), width))
-                for col, c in enumerate(value):
-                    if int(c) == ON:
-                        on_cells.append((row, col))
-                    elif int(c) not in cell_states:
-                        raise Exception("map",
-                                        "Invalid character in map: %s" % c)
-                row += 1
-        if height != row:
-            raise Exception("map",
-                            "Incorrect number of rows.  Expected %s, got %s"
-                            % (height, row))
-        return {
-            'size': (height, width),
-            'num_players': num_players,
-            'on_cells': on_cells
-        }
+        return parse_map(map_text)
 
     def get_map_output(self):
         result = []
@@ -395,6 +402,19 @@ class LightsOut(Game):
 
         return replay
 
+    def get_replay_orders(self, replay):
+        """ Rebuild orders of every turn from a replay made by get_replay
+
+            Every order flips up to 3 cells, the first change of a turn
+            is always the ordered cell itself.
+            Used to re-simulate stored games without launching bots
+        """
+        orders = {}
+        for row, col, turn in replay['changes']:
+            if turn not in orders:
+                orders[turn] = [(turn % 2, [(row, col)])]
+        return orders
+
 
 class Change:
     def __init__(self, loc, turn):
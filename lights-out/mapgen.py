@@ -0,0 +1,152 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import os
+import random
+import sys
+from optparse import OptionParser
+
+from lightsgame import parse_map, ON, OFF
+
+sys.path.append("../worker")
+try:
+    from mapcorpus import load_corpus
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from mapcorpus import load_corpus
+
+
+def generate_map(rows, cols, density=0.5, symmetric=True):
+    """ Generate map text for a 2 player game
+
+        Every cell is ON with the given probability,
+        symmetric maps look the same after rotating them by 180 degrees.
+    """
+    grid = [[OFF] * cols for _ in range(rows)]
+    for row in range(rows):
+        for col in range(cols):
+            if symmetric and (row, col) > (rows - 1 - row, cols - 1 - col):
+                grid[row][col] = grid[rows - 1 - row][cols - 1 - col]
+            else:
+                grid[row][col] = ON if random.random() < density else OFF
+
+    lines = ['players 2', 'rows %s' % rows, 'cols %s' % cols]
+    lines += ['m %s' % ''.join(str(cell) for cell in row) for row in grid]
+    return '\n'.join(lines) + '\n'
+
+
+def solve(map_data):
+    """ Cells to switch to turn all the lights off
+
+        A move at (row, col) flips that cell and its right and bottom
+        neighbours, so going through the cells row by row, every cell
+        still ON has to be switched itself (and is allowed to, being ON).
+        That makes the solution unique: the map is always solvable and
+        a game can't end before all these moves are made.
+    """
+    height, width = map_data['size']
+    grid = [[OFF] * width for _ in range(height)]
+    for row, col in map_data['on_cells']:
+        grid[row][col] = ON
+
+    moves = []
+    for row in range(height):
+        for col in range(width):
+            if grid[row][col] == ON:
+                moves.append((row, col))
+                grid[row][col] = OFF
+                if col + 1 < width:
+                    grid[row][col + 1] ^= 1
+                if row + 1 < height:
+                    grid[row + 1][col] ^= 1
+    return moves
+
+
+def validate_map(map_data, turns=80):
+    """ Returns a list of problems that make the map unfit for play """
+    errors = []
+    if map_data['num_players'] != 2:
+        errors.append('map must be for 2 players')
+    if not map_data['on_cells']:
+        errors.append('map has no ON cells, game is over before it starts')
+    moves = len(solve(map_data))
+    if moves > turns:
+        errors.append('map needs %s moves to solve, game has %s turns' % (moves, turns))
+    return errors
+
+
+def main(argv):
+    usage = ("Usage: %prog [options] generate\n"
+             "       %prog [options] validate map_file_or_dir ...")
+    parser = OptionParser(usage=usage)
+    parser.add_option("-n", "--count", dest="count", default=1, type="int",
+                      help="Number of maps to generate")
+    parser.add_option("--rows", dest="rows", default=8, type="int")
+    parser.add_option("--cols", dest="cols", default=8, type="int")
+    parser.add_option("--density", dest="density", default=0.5, type="float",
+                      help="Share of cells that are ON")
+    parser.add_option("--asymmetric", dest="symmetric",
+                      action="store_false", default=True,
+                      help="Don't make maps rotationally symmetric")
+    parser.add_option("-t", "--turns", dest="turns", default=80, type="int",
+                      help="Number of turns the maps are played for")
+    parser.add_option("-o", "--output_dir", dest="output_dir", default="maps",
+                      help="Directory to write generated maps to")
+    parser.add_option("--seed", dest="seed", default=None, type="int")
+    (opts, args) = parser.parse_args(argv)
+    if not args or args[0] not in ('generate', 'validate'):
+        parser.print_help()
+        return -1
+    random.seed(opts.seed)
+
+    if args[0] == 'generate':
+        if not os.path.exists(opts.output_dir):
+            os.makedirs(opts.output_dir)
+        generated = 0
+        while generated < opts.count:
+            text = generate_map(opts.rows, opts.cols, opts.density, opts.symmetric)
+            if validate_map(parse_map(text), opts.turns):
+                continue
+            name = 'lights_%dx%d_%03d.map' % (opts.rows, opts.cols, generated)
+            with open(os.path.join(opts.output_dir, name), 'w') as map_file:
+                map_file.write(text)
+            generated += 1
+            print(name)
+        # parse new maps into the corpus cache right away
+        load_corpus(opts.output_dir, parse_map)
+        return 0
+
+    failed = 0
+    for path in args[1:]:
+        if os.path.isdir(path):
+            try:
+                corpus = load_corpus(path, parse_map)
+            except Exception as e:
+                print('%s: %s' % (path, e))
+                failed += 1
+                continue
+            maps = [(os.path.join(path, name), corpus.maps[name])
+                    for name in corpus.names]
+        else:
+            try:
+                with open(path, 'r') as map_file:
+                    maps = [(path, parse_map(map_file.read()))]
+            except Exception as e:
+                print('%s: %s' % (path, e))
+                failed += 1
+                continue
+        for map_path, map_data in maps:
+            errors = validate_map(map_data, opts.turns)
+            if errors:
+                failed += 1
+                print('%s: %s' % (map_path, '; '.join(errors)))
+    print('%d invalid maps' % failed)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,7 +6,6 @@ import os
 import time
 from optparse import OptionParser, OptionGroup
 import random
-import cProfile
 import json
 try:
     from StringIO import StringIO
@@ -14,11 +13,14 @@ except ImportError:
     from io import StringIO
 
 import visualizer.visualize_locally
-from lightsgame import LightsOut
+from lightsgame import LightsOut, parse_map
 
 sys.path.append("../worker")
 try:
     from engine import run_game
+    from tournament import SCHEDULERS, run_tournament as run_tournament_games
+    from mapcorpus import load_corpus
+    from profiling import PROFILERS, profile_call, profile_path, summarize
 except ImportError:
     # this can happen if we're launched with cwd outside our own dir
     # get our full path, then work relative from that
@@ -28,6 +30,9 @@ except ImportError:
     sys.path.append(cmd_folder + "/../worker")
     # try again
     from engine import run_game
+    from tournament import SCHEDULERS, run_tournament as run_tournament_games
+    from mapcorpus import load_corpus
+    from profiling import PROFILERS, profile_call, profile_path, summarize
 
 # make stderr red text
 try:
@@ -99,6 +104,8 @@ def main(argv):
     # number of players is determined by the map file
     parser.add_option("-m", "--map_file", dest="map", default=None,
                       help="Name of the map file")
+    parser.add_option("--map_dir", dest="map_dir", default=None,
+                      help="Directory of map files, rounds cycle through them")
 
     # maximum number of turns that the game will be played
     parser.add_option("-t", "--turns", dest="turns",
@@ -157,6 +164,22 @@ def main(argv):
                           action='store_true', default=False)
     parser.add_option_group(game_group)
 
+    # tournament between a pool of bots, replaces fixed lineup rounds
+    tournament_group = OptionGroup(parser, "Tournament Options",
+                                   "Options that control tournament scheduling and ratings")
+    tournament_group.add_option("--tournament", dest="tournament", default=None,
+                                choices=SCHEDULERS,
+                                help="Pair bots with one of: " + ', '.join(SCHEDULERS))
+    tournament_group.add_option("--concurrency", dest="concurrency",
+                                default=2, type="int",
+                                help="Number of games played at the same time")
+    tournament_group.add_option("--max_games", dest="max_games",
+                                default=100, type="int",
+                                help="Stop the tournament after this many games")
+    tournament_group.add_option("--ratings_file", dest="ratings_file", default=None,
+                                help="Rating table checkpoint, resumed if it exists")
+    parser.add_option_group(tournament_group)
+
     # the log directory must be specified for any logging to occur, except:
     #    bot errors to stderr
     #    verbose levels 1 & 2 to stdout and stderr
@@ -195,7 +218,17 @@ def main(argv):
                          help="Print out status as game goes.")
     log_group.add_option("--profile", dest="profile",
                          action="store_true", default=False,
-                         help="Run under the python profiler")
+                         help="Run games under the python profiler, "
+                              "profiles are written next to the replays")
+    log_group.add_option("--profiler", dest="profiler", default="cprofile",
+                         choices=PROFILERS,
+                         help="Profiler to use: " + ', '.join(PROFILERS))
+    log_group.add_option("--profile_every", dest="profile_every",
+                         default=1, type="int",
+                         help="Profile only every Nth game")
+    log_group.add_option("--profile_top", dest="profile_top",
+                         default=20, type="int",
+                         help="Number of hot functions in the profile summary")
     parser.add_option("--nolaunch", dest="nolaunch",
                       action='store_true', default=False,
                       help="Prevent visualizer from launching")
@@ -209,16 +242,17 @@ def main(argv):
         print('Can not access the map file')
         parser.print_help()
         return -1
+    if opts.map_dir is not None and not os.path.isdir(opts.map_dir):
+        print('Can not access the map directory')
+        parser.print_help()
+        return -1
+    if opts.map_dir is not None and not any(
+            name.endswith('.map') for name in os.listdir(opts.map_dir)):
+        print('No .map files in the map directory')
+        parser.print_help()
+        return -1
     try:
-        if opts.profile:
-            # put profile file into output dir if we can
-            prof_file = "asteroids.profile"
-            if opts.log_dir:
-                prof_file = os.path.join(opts.log_dir, prof_file)
-            # cProfile needs to be explitly told about out local and global context
-            print("Running profile and outputting to {0}".format(prof_file,), file=stderr)
-            cProfile.runctx("run_rounds(opts,args)", globals(), locals(), prof_file)
-        else:
+        if not opts.profile:
             # only use psyco if we are not profiling
             # (psyco messes with profiling)
             try:
@@ -226,37 +260,42 @@ def main(argv):
                 psyco.full()
             except ImportError:
                 pass
+        if opts.tournament:
+            run_tournament(opts, args)
+        else:
             run_rounds(opts,args)
         return 0
     except Exception:
         traceback.print_exc()
         return -1
 
-def run_rounds(opts,args):
-    def get_cmd_wd(cmd, exec_rel_cwd=False):
-        ''' get the proper working directory from a command line '''
-        new_cmd = []
-        wd = None
-        for i, part in reversed(list(enumerate(cmd.split()))):
-            if wd == None and os.path.exists(part):
-                wd = os.path.dirname(os.path.realpath(part))
-                basename = os.path.basename(part)
-                if i == 0:
-                    if exec_rel_cwd:
-                        new_cmd.insert(0, os.path.join(".", basename))
-                    else:
-                        new_cmd.insert(0, part)
+def get_cmd_wd(cmd, exec_rel_cwd=False):
+    ''' get the proper working directory from a command line '''
+    new_cmd = []
+    wd = None
+    for i, part in reversed(list(enumerate(cmd.split()))):
+        if wd == None and os.path.exists(part):
+            wd = os.path.dirname(os.path.realpath(part))
+            basename = os.path.basename(part)
+            if i == 0:
+                if exec_rel_cwd:
+                    new_cmd.insert(0, os.path.join(".", basename))
                 else:
-                    new_cmd.insert(0, basename)
+                    new_cmd.insert(0, part)
             else:
-                new_cmd.insert(0, part)
-        return wd, ' '.join(new_cmd)
-    def get_cmd_name(cmd):
-        ''' get the name of a bot from the command line '''
-        for i, part in enumerate(reversed(cmd.split())):
-            if os.path.exists(part):
-                return os.path.basename(part)
-# this split of options is not needed, but left for documentation
+                new_cmd.insert(0, basename)
+        else:
+            new_cmd.insert(0, part)
+    return wd, ' '.join(new_cmd)
+
+def get_cmd_name(cmd):
+    ''' get the name of a bot from the command line '''
+    for i, part in enumerate(reversed(cmd.split())):
+        if os.path.exists(part):
+            return os.path.basename(part)
+
+def get_game_options(opts):
+    # this split of options is not needed, but left for documentation
     game_options = {
         "map": opts.map,
         "sim_steps": opts.sim_steps,
@@ -270,6 +309,33 @@ def run_rounds(opts,args):
         game_options['player_seed'] = opts.player_seed
     if opts.engine_seed != None:
         game_options['engine_seed'] = opts.engine_seed
+    return game_options
+
+def run_tournament(opts, args):
+    game_options = get_game_options(opts)
+    if opts.map is not None:
+        with open(opts.map, 'r') as map_file:
+            game_options['map'] = map_file.read()
+    engine_options = {
+        "loadtime": opts.loadtime,
+        "turntime": opts.turntime,
+        "map_file": opts.map,
+        "turns": opts.turns,
+        "serial": opts.serial,
+        "strict": opts.strict,
+        "secure_jail": opts.secure_jail,
+        "end_wait": opts.end_wait }
+    if opts.log_dir and not os.path.exists(opts.log_dir):
+        os.mkdir(opts.log_dir)
+    bots = [(get_cmd_name(arg) or arg, get_cmd_wd(arg, exec_rel_cwd=opts.secure_jail))
+            for arg in args]
+    _, prof_paths = run_tournament_games(LightsOut, game_options, engine_options,
+                                         bots, opts, log=sys.stdout)
+    if prof_paths:
+        print_profile_summary(opts, prof_paths)
+
+def run_rounds(opts,args):
+    game_options = get_game_options(opts)
     engine_options = {
         "loadtime": opts.loadtime,
         "turntime": opts.turntime,
@@ -285,15 +351,24 @@ def run_rounds(opts,args):
         "capture_errors": opts.capture_errors,
         "secure_jail": opts.secure_jail,
         "end_wait": opts.end_wait }
+    # maps are read and parsed once, then shared by all rounds
+    corpus = None
+    if opts.map_dir is not None:
+        corpus = load_corpus(opts.map_dir, parse_map)
+    elif opts.map is not None:
+        with open(opts.map, 'r') as map_file:
+            game_options['map'] = map_file.read()
+    prof_paths = []
     for round in range(opts.rounds):
         # initialize game
         game_id = round + opts.game_id
-        if opts.map is not None:
-            with open(opts.map, 'r') as map_file:
-                game_options['map'] = map_file.read()
+        if corpus is not None:
+            map_name, game_options['map'], game_options['map_data'] = corpus.get(round)
+            engine_options['map_file'] = os.path.join(opts.map_dir, map_name)
         if opts.engine_seed:
             game_options['engine_seed'] = opts.engine_seed + round
         game = LightsOut(game_options)
+        game_options['map_data'] = game.map_data
         # initialize bots
         bots = [get_cmd_wd(arg, exec_rel_cwd=opts.secure_jail) for arg in args]
         bot_count = len(bots)
@@ -391,7 +466,13 @@ def run_rounds(opts,args):
             real_replay_io = engine_options['replay_log']
             engine_options['replay_log'] = intcpt_replay_io
 
-        result = run_game(game, bots, engine_options)
+        if opts.profile and round % opts.profile_every == 0:
+            prof_path = profile_path(opts.log_dir, game_id, opts.profiler)
+            result = profile_call(opts.profiler, prof_path,
+                                  run_game, game, bots, engine_options)
+            prof_paths.append(prof_path)
+        else:
+            result = run_game(game, bots, engine_options)
 
         # add player names, write to proper io, reset back to normal
         if opts.log_replay:
@@ -422,6 +503,15 @@ def run_rounds(opts,args):
             else:
                 visualizer.visualize_locally.launch(replay_path, opts.nolaunch, 
                         opts.html_file)
+    if prof_paths:
+        print_profile_summary(opts, prof_paths)
+
+def print_profile_summary(opts, prof_paths):
+    summary = summarize(prof_paths, opts.profile_top)
+    print(summary, file=stderr)
+    if opts.log_dir:
+        with open(os.path.join(opts.log_dir, 'profile.summary'), 'w') as summary_file:
+            summary_file.write(summary)
 
 if __name__ == "__main__":
     sys.exit(main(sys.argv[1:]))
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.core.urlresolvers import reverse
 from django.db.models import Prefetch
 from solo.admin import SingletonModelAdmin
-from apps.games.models import Game, Bot, Player, ParsingInfo, Match, Opponent
+from apps.games.models import Game, Bot, Player, ParsingInfo, Match, Opponent, \
+    Leaderboard, MatchTask
 
 
 class BotInline(admin.TabularInline):
@@ -116,9 +117,25 @@ class MatchAdmin(admin.ModelAdmin):
         ))
 
 
+class MatchTaskAdmin(admin.ModelAdmin):
+    model = MatchTask
+
+    fields = ['hk_id', 'status', 'attempts', 'error', 'updated']
+    readonly_fields = ['updated']
+
+    list_display = ('hk_id', 'status', 'attempts', 'updated')
+    list_filter = ('status',)
+
+    def get_queryset(self, request):  # performance optimisation
+        qs = super(MatchTaskAdmin, self).get_queryset(request)
+        return qs.defer('data')
+
+
 admin.site.register(Game, GameAdmin)
 admin.site.register(Bot, BotAdmin)
 admin.site.register(Player, PlayerAdmin)
 admin.site.register(Match, MatchAdmin)
+admin.site.register(MatchTask, MatchTaskAdmin)
 
 admin.site.register(ParsingInfo, SingletonModelAdmin)
+admin.site.register(Leaderboard, SingletonModelAdmin)
@@ -0,0 +1,270 @@
+"""
+    Read-only JSON API, see apps.games.api_urls.
+
+    List endpoints are keyset-paginated like site pages, every page
+    holds links to its neighbours. Export endpoints stream all rows
+    as NDJSON (one JSON object per line) from a server-side cursor,
+    so neither DB client nor the view keep the whole table in memory.
+"""
+
+import json
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.backends.postgresql.base import utc_tzinfo_factory
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.generic import View
+
+from apps.games.models import Game, Player, Bot, Match, Opponent
+from apps.games.pagination import KeysetPaginator
+
+PAGE_SIZE = 100
+EXPORT_CHUNK = 2000  # rows fetched from server-side cursor at once
+
+
+def game_data(game):
+    return {
+        'slug': game.slug,
+        'name': game.name,
+        'difficulty': game.difficulty,
+        'bot_count': game.bot_count,
+        'match_count': game.match_count,
+        'leader': game.leader.name if game.leader else None,
+        'leader_score': game.leader_score,
+    }
+
+
+def player_data(player):
+    return {
+        'name': player.name,
+        'country': player.country,
+        'avatar': player.avatar,
+        'score': player.score,
+        'bot_count': player.bot_count,
+        'match_count': player.match_count,
+        'top1': player.top1,
+        'top10': player.top10,
+    }
+
+
+def bot_data(bot):
+    return {
+        'id': bot.pk,
+        'game': bot.game.slug,
+        'player': bot.player.name,
+        'rank': bot.rank,
+        'score': bot.score,
+        'language': bot.language,
+    }
+
+
+def match_data(match):
+    return {
+        'id': match.hk_id,
+        'game': match.game.slug,
+        'date': match.date,
+        'result': match.result,
+        'message': match.message,
+        'bots': [opponent.bot_id for opponent in match.opponent_set.all()],
+        'players': [opponent.bot.player.name
+                    for opponent in match.opponent_set.all()],
+    }
+
+
+def page_response(request, queryset, ordering, serialize):
+    """ JSON page of a keyset-paginated list """
+    page = KeysetPaginator(queryset, PAGE_SIZE, ordering, request=request)
+    page = page.page(request.GET.get('cursor'))
+
+    def link(querystring):
+        return request.build_absolute_uri('?' + querystring)
+
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page],
+        'next': link(page.next_querystring) if page.has_next else None,
+        'previous': link(page.previous_querystring) if page.has_previous else None,
+    })
+
+
+def server_cursor(queryset, chunk_size=EXPORT_CHUNK):
+    """ Yields chunks of rows of values_list() queryset
+        read from a server-side (named) cursor.
+    """
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    connection = connections[queryset.db]
+
+    # named cursors live only inside a transaction
+    with transaction.atomic(using=queryset.db):
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(name='export_%s' % uuid.uuid4().hex)
+        try:
+            # same dates as ORM gives, see DatabaseWrapper.create_cursor
+            cursor.tzinfo_factory = utc_tzinfo_factory if settings.USE_TZ else None
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def ndjson_response(lines, filename):
+    response = StreamingHttpResponse(
+        (json.dumps(line, cls=DjangoJSONEncoder) + '\n' for line in lines),
+        content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+
+def filter_by_game(request, queryset, field='game__slug'):
+    game = request.GET.get('game')
+    if game:
+        queryset = queryset.filter(**{field: game})
+    return queryset
+
+
+class GameList(View):
+    query_budget = 2
+
+    def get(self, request):
+        games = Game.objects.select_related('leader')
+        return JsonResponse({'results': [game_data(game) for game in games]})
+
+
+class GameDetail(View):
+    query_budget = 2
+
+    def get(self, request, slug):
+        game = get_object_or_404(Game.objects.select_related('leader'), slug=slug)
+        return JsonResponse(game_data(game))
+
+
+class PlayerList(View):
+    query_budget = 2
+
+    def get(self, request):
+        return page_response(request, Player.objects.all(),
+                             ['-score', 'id'], player_data)
+
+
+class PlayerDetail(View):
+    query_budget = 2
+
+    def get(self, request, slug):
+        player = get_object_or_404(Player, name=slug)
+        return JsonResponse(player_data(player))
+
+
+class BotList(View):
+    query_budget = 2
+
+    def get(self, request):
+        bots = Bot.objects.select_related('game', 'player')
+        bots = filter_by_game(request, bots)
+        player = request.GET.get('player')
+        if player:
+            bots = bots.filter(player__name=player)
+        return page_response(request, bots, ['rank', 'id'], bot_data)
+
+
+class MatchList(View):
+    query_budget = 3
+
+    def get(self, request):
+        matches = Match.full_objects.select_related('game').prefetch_related(
+            Prefetch(
+                'opponent_set',
+                queryset=Opponent.objects.select_related('bot__player')
+            )
+        )
+        matches = filter_by_game(request, matches)
+        player = request.GET.get('player')
+        if player:
+            matches = matches.filter(bots__player__name=player)
+        return page_response(request, matches, ['-date', '-id'], match_data)
+
+
+class MatchDetail(View):
+    query_budget = 3
+
+    def get(self, request, slug):
+        match = get_object_or_404(
+            Match.objects.select_related('game').prefetch_related(
+                Prefetch(
+                    'opponent_set',
+                    queryset=Opponent.objects.select_related('bot__player')
+                )
+            ),
+            hk_id=slug
+        )
+        return JsonResponse(match_data(match))
+
+
+# ============== EXPORTS ==================
+
+class PlayersExport(View):
+    fields = ['name', 'country', 'avatar', 'score', 'bot_count',
+              'match_count', 'top1', 'top10']
+
+    def get(self, request):
+        players = Player.objects.order_by('pk').values_list(*self.fields)
+
+        def lines():
+            for rows in server_cursor(players):
+                for row in rows:
+                    yield dict(zip(self.fields, row))
+
+        return ndjson_response(lines(), 'players.ndjson')
+
+
+class BotsExport(View):
+    fields = ['id', 'game', 'player', 'rank', 'score', 'language',
+              'wins', 'draws', 'losses', 'match_count']
+
+    def get(self, request):
+        bots = Bot.objects.order_by('game', 'rank', 'pk').values_list(
+            'pk', 'game__slug', 'player__name', 'rank', 'score', 'language',
+            'stats__wins', 'stats__draws', 'stats__losses', 'stats__match_count'
+        )
+        bots = filter_by_game(request, bots)
+
+        def lines():
+            for rows in server_cursor(bots):
+                for row in rows:
+                    yield dict(zip(self.fields, row))
+
+        return ndjson_response(lines(), 'bots.ndjson')
+
+
+class MatchesExport(View):
+    fields = ['id', 'game', 'date', 'result', 'message']
+
+    def get(self, request):
+        matches = Match.objects.order_by('pk').values_list(
+            'pk', 'hk_id', 'game__slug', 'date', 'result', 'message')
+        matches = filter_by_game(request, matches)
+
+        def lines():
+            for rows in server_cursor(matches):
+                # one query for bots of the whole chunk
+                opponents = {}
+                for match_id, bot_id, player in Opponent.objects.filter(
+                        match__in=[row[0] for row in rows]).values_list(
+                        'match', 'bot', 'bot__player__name'):
+                    opponents.setdefault(match_id, []).append((bot_id, player))
+
+                for row in rows:
+                    line = dict(zip(self.fields, row[1:]))
+                    bots = opponents.get(row[0], [])
+                    line['bots'] = [bot_id for bot_id, _ in bots]
+                    line['players'] = [player for _, player in bots]
+                    yield line
+
+        return ndjson_response(lines(), 'matches.ndjson')
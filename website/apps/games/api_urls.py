@@ -0,0 +1,36 @@
+from django.conf.urls import url
+from apps.games.cache import versioned_page
+from apps.games.views import MatchReplay
+from apps.games.api import GameList, GameDetail, PlayerList, PlayerDetail, \
+    BotList, MatchList, MatchDetail, PlayersExport, BotsExport, MatchesExport
+
+urlpatterns = [
+    url(r'^games/$', versioned_page(GameList.as_view()),
+        name='game-list'),
+    url(r'^games/(?P<slug>[-\w]+)/$', versioned_page(GameDetail.as_view()),
+        name='game-detail'),
+
+    url(r'^players/$', versioned_page(PlayerList.as_view()),
+        name='player-list'),
+    url(r'^players/(?P<slug>[-\w]+)/$', versioned_page(PlayerDetail.as_view()),
+        name='player-detail'),
+
+    url(r'^bots/$', versioned_page(BotList.as_view()),
+        name='bot-list'),
+
+    url(r'^matches/$', versioned_page(MatchList.as_view()),
+        name='match-list'),
+    url(r'^matches/(?P<slug>[-\w]+)/$', versioned_page(MatchDetail.as_view()),
+        name='match-detail'),
+    url(r'^matches/(?P<slug>[-\w]+)/replay/$', versioned_page(MatchReplay.as_view()),
+        name='match-replay'),
+
+    # ============== EXPORTS ==================
+    # whole tables as NDJSON, bots and matches may be filtered by ?game=<slug>
+    url(r'^export/players\.ndjson$', versioned_page(PlayersExport.as_view()),
+        name='export-players'),
+    url(r'^export/bots\.ndjson$', versioned_page(BotsExport.as_view()),
+        name='export-bots'),
+    url(r'^export/matches\.ndjson$', versioned_page(MatchesExport.as_view()),
+        name='export-matches'),
+]
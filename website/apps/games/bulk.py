@@ -0,0 +1,42 @@
+"""
+    Bulk UPDATE of many rows with different values.
+
+    Django 1.9 has only bulk_create, so rows are updated
+    with UPDATE ... FROM (VALUES ...), one query per batch.
+"""
+
+from django.db import connections
+
+BATCH_SIZE = 1000
+
+
+def bulk_update(model, fields, rows, batch_size=BATCH_SIZE, using='default'):
+    """ Set fields of many rows of a model.
+
+        rows are tuples of (pk, value of every field).
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk = quote(model._meta.pk.column)
+
+    fields = [model._meta.get_field(name) for name in fields]
+    columns = ', '.join([pk] + [quote(field.column) for field in fields])
+    # values are cast, types of VALUES rows are guessed by DB otherwise
+    assignments = ', '.join('%s = v.%s::%s' % (quote(field.column),
+                                               quote(field.column),
+                                               field.db_type(connection))
+                            for field in fields)
+    row_sql = '(%s)' % ', '.join(['%s'] * (len(fields) + 1))
+
+    with connection.cursor() as cursor:
+        for start in xrange(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                'UPDATE %s SET %s FROM (VALUES %s) AS v (%s) WHERE %s.%s = v.%s' % (
+                    table, assignments, ', '.join([row_sql] * len(batch)),
+                    columns, table, pk, pk),
+                # values are adapted for DB as fields do it, e.g. JSONField
+                [field.get_db_prep_save(value, connection) for row in batch
+                 for field, value in zip([model._meta.pk] + fields, row)]
+            )
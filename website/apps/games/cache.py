@@ -0,0 +1,126 @@
+"""
+    Caching of rendered pages and template fragments.
+
+    Site data changes only when ingest commands run, every such command
+    bumps DataVersion and cache keys include the version, so cached
+    pages of old data are never served and just expire.
+
+    The same version is the ETag of every page and time of its bump
+    is Last-Modified, so repeat visits get 304 for one query.
+    Both also depend on the deployed code (see get_build), so
+    a deploy changing pages outdates them too.
+"""
+
+import datetime
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.lru_cache import lru_cache
+
+from apps.games.models import DataVersion
+
+# code that renders pages, of BASE_DIR
+BUILD_DIRS = ('apps', 'hackerrank_tools', 'templates')
+BUILD_FILES = ('.py', '.html')
+
+
+def build_files():
+    for top in BUILD_DIRS:
+        for root, dirs, files in os.walk(os.path.join(settings.BASE_DIR, top)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(BUILD_FILES):
+                    yield os.path.join(root, name)
+
+
+@lru_cache()
+def get_build():
+    """ (id, time) of the deployed code, counted once per process.
+        Id is BUILD_ID setting or a hash of the code, time is
+        the latest change of its files.
+    """
+    digest = hashlib.md5()
+    modified = 0
+    for path in build_files():
+        digest.update(os.path.relpath(path, settings.BASE_DIR))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        modified = max(modified, os.path.getmtime(path))
+    build_id = getattr(settings, 'BUILD_ID', '') or digest.hexdigest()[:12]
+    return build_id, datetime.datetime.fromtimestamp(modified)
+
+
+def get_data_version(request):
+    """ DataVersion of the site, read once per request """
+    if not hasattr(request, '_data_version'):
+        request._data_version = DataVersion.get_solo()
+    return request._data_version
+
+
+def bump_data_version():
+    DataVersion.get_solo()  # make sure it exists
+    DataVersion.objects.update(version=F('version') + 1,
+                               updated=timezone.now())
+
+
+def page_version(request):
+    """ Version of pages: of the code and of the data """
+    return '%s-%d' % (get_build()[0], get_data_version(request).version)
+
+
+def data_version(request):
+    """ Context processor, for {% cache %} keys in templates """
+    return {'data_version': SimpleLazyObject(lambda: page_version(request))}
+
+
+def page_cache_key(request, version):
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return 'page:%s:%s' % (version, path)
+
+
+def cached_page(view):
+    """ Serve view responses from cache while site data stays the same """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', None)
+        if request.method not in ('GET', 'HEAD') or timeout == 0:
+            return view(request, *args, **kwargs)
+
+        cache = caches[getattr(settings, 'PAGE_CACHE', 'default')]
+        key = page_cache_key(request, page_version(request))
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response['Content-Type']), timeout)
+        return response
+
+    return wrapper
+
+
+def page_etag(request, *args, **kwargs):
+    return page_version(request)
+
+
+def page_last_modified(request, *args, **kwargs):
+    return max(get_data_version(request).updated, get_build()[1])
+
+
+def versioned_page(view):
+    """ Cached page answering conditional requests with 304 """
+    return condition(etag_func=page_etag,
+                     last_modified_func=page_last_modified)(cached_page(view))
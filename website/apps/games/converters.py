@@ -1,75 +1,294 @@
 """
     Replay converters for different games.
     From hackerrank format to ours.
+
+    Converters work on batches of sources, so whatever is the same
+    for every match of a game is prepared once, and data they need
+    from hackerrank is fetched for the whole batch concurrently.
+    A converter is registered for a game slug with @converter(slug),
+    convert_replays() dispatches sources to them by challenge_slug.
 """
 
-import requests
+import itertools
+import re
 
+from apps.games.fetcher import get_fetcher, FOREVER
 
-def conway_convert(source):
-    # hackerrank defaults
-    rows = cols = 29
-    turns_required = 80
+CONVERTERS = {}  # game slug: batch converter
 
-    # get moves data from hackerrank
-    moves_url = source['codechecker_stdout']
-    r = requests.get(moves_url)
-    moves = r.json()['payload']
 
-    # parse moves data
-    cells = []
-    turns = 0
+def converter(slug):
+    """ Registers a function converting a list of sources
+        of the game into a list of replays.
+    """
+    def register(func):
+        CONVERTERS[slug] = func
+        return func
+    return register
+
+
+def convert_replay(source):
+    """ Replay of one source, None if its game has no converter """
+    replay, error = convert_replays([source])[0]
+    if error:
+        raise error
+    return replay
+
+
+def convert_replays(sources):
+    """ Replays of a batch of sources, of any games.
+        Returns (replay, error) for every source, in order of sources;
+        replay is None for games without converter.
+    """
+    games = {}  # slug: indexes of sources
+    for i, source in enumerate(sources):
+        games.setdefault(source['challenge_slug'], []).append(i)
+
+    results = [(None, None)] * len(sources)
+    for game, indexes in games.items():
+        if game not in CONVERTERS:
+            continue
+        convert_batch = CONVERTERS[game]
+        batch = [sources[i] for i in indexes]
+
+        try:
+            replays = [(replay, None) for replay in convert_batch(batch)]
+        except Exception:
+            # one bad source fails the batch, find it
+            replays = []
+            for source in batch:
+                try:
+                    replays.append((convert_batch([source])[0], None))
+                except Exception as e:
+                    replays.append((None, e))
+
+        for i, result in zip(indexes, replays):
+            results[i] = result
+
+    return results
+
+
+# ============== MOVES ==================
+
+def source_moves(source):
+    """ Output of the game checker, that is moves of a match. It is
+        fetched from hackerrank once and kept in source, so stored source
+        is enough to convert it again.
+    """
+    if 'moves' not in source:
+        moves_url = source['codechecker_stdout']
+        source['moves'] = get_fetcher().get_json(moves_url, ttl=FOREVER,
+                                                 valid=has_payload)['payload']
+    return source['moves']
+
+
+def has_payload(data):
+    return isinstance(data, dict) and 'payload' in data
+
+
+def fetch_moves(sources):
+    """ source_moves() for a batch, moves missing in sources
+        are fetched concurrently.
+    """
+    missing = [source for source in sources if 'moves' not in source]
+    if missing:
+        for _ in get_fetcher().imap(source_moves, missing):
+            pass
+
+
+# moves as hackerrank writes them, one "row col" per line
+MOVES = re.compile(r'(?:\d+ \d+ *\n)*\Z')
+
+# int() of every coordinate is the slowest part of parsing;
+# strings of JSON data are unicode
+NUMBERS = dict((unicode(i), i) for i in range(100))
+
+
+def parse_moves(moves):
+    """ Lists of rows and of cols of moves,
+        up to the first move that is not a pair of numbers.
+    """
+    text = '\n'.join(moves)
+    if text:
+        text += '\n'
+    if not MOVES.match(text):
+        return parse_moves_slow(moves)
+
+    # all moves are valid, they are parsed at once
+    tokens = text.split()
+    try:
+        numbers = map(NUMBERS.__getitem__, tokens)
+    except KeyError:
+        numbers = map(int, tokens)  # off the table, converted as is
+    return numbers[0::2], numbers[1::2]
+
+
+def parse_moves_slow(moves):
+    """ parse_moves() one move at a time """
+    rows = []
+    cols = []
     for move in moves:
         try:
             row, col = move.split()
-            cells.append([int(row), int(col), turns + 1, turns % 2])
-            turns += 1
+            row, col = int(row), int(col)
         except ValueError:
             break
+        rows.append(row)
+        cols.append(col)
+    return rows, cols
+
+
+def player_turns(turns):
+    """ Turns made by each of two players moving in turn """
+    if turns % 2:
+        # last move was made by first player
+        return [turns, turns-1]
+    else:
+        # last move was made by second player
+        return [turns-1, turns]
+
+
+# ============== CONWAY ==================
+
+# hackerrank defaults
+CONWAY_ROWS = CONWAY_COLS = 29
+CONWAY_TURNS_REQUIRED = 80
+
+# empty map, the same for all matches. Replays share it, never change it
+CONWAY_MAP = {
+    'rows': CONWAY_ROWS,
+    'cols': CONWAY_COLS,
+    'data': ('-' * CONWAY_COLS,) * CONWAY_ROWS,
+}
+
+
+def conway_replay(source):
+    """ Replay of a conway match which moves are already in source """
+    rows, cols = parse_moves(source['moves'])
+    turns = len(rows)
 
-    # replay template
-    # TODO: only replaydata is changing between games
     replay = {
         'playernames': [x['hacker_username'] for x in source['actors']],
         'status': ['survived', 'survived'],
         'replayformat': 'json',
         'challenge': 'lifegame',
         'replaydata': {
-            'cells': cells,
+            # [row, col, turn, player], tuples are the same as lists in JSON
+            'cells': zip(rows, cols, itertools.count(1), itertools.cycle((0, 1))),
             'revision': 1,
             'players': 2,
-            # empty map
-            'map': {
-                'rows': rows,
-                'cols': cols,
-                'data': ['-' * cols for _ in range(rows)]
-            },
+            'map': CONWAY_MAP,
         },
+        'playerturns': player_turns(turns),
     }
 
-    if turns < turns_required:
+    if turns < CONWAY_TURNS_REQUIRED:
         bot = turns % 2  # this bot crashed or timed out
         status = source['message'].split('\n')[0]
         replay['status'][bot] = status
 
-    if turns % 2:
-        # last move was made by first player
-        replay['playerturns'] = [turns, turns-1]
-    else:
-        # last move was made by second player
-        replay['playerturns'] = [turns-1, turns]
-
     return replay
 
 
-CONVERTERS = {
-    'conway': conway_convert,
-}
+@converter('conway')
+def conway_convert(sources):
+    fetch_moves(sources)
+    return [conway_replay(source) for source in sources]
 
 
-def convert_replay(source):
-    game = source['challenge_slug']
+# ============== LIGHTS OUT ==================
+
+# checker output of lights-out starts with the initial grid,
+# a line of 0 and 1 for every row, moves follow it
+LIGHTS_ROW = re.compile(r'[01]+\Z')
+LIGHT_ON = '1'
+
+# turns are numbered as our engine does (see lightsgame.is_his_turn):
+# player 1 moves on odd turns, player 0 on even ones; the first
+# player on hackerrank is player 0, so turn 1 is left empty
+LIGHTS_OUT_FIRST_TURN = 2
+
+
+def lights_out_player_turns(last):
+    """ Last turn of each of two players when the game stops at last turn """
+    return [last - last % 2, last - (last + 1) % 2]
+
+
+def lights_out_flips(rows, cols):
+    """ {cell: cells switched by a move at it} for a map of given size.
+        A move switches its cell and neighbours to the right and below.
+    """
+    flips = {}
+    for row in range(rows):
+        for col in range(cols):
+            flips[row, col] = tuple(
+                (r, c) for r, c in ((row, col), (row, col + 1), (row + 1, col))
+                if r < rows and c < cols
+            )
+    return flips
+
+
+def lights_out_replay(source, flips):
+    """ Replay of a lights-out match which moves are already in source,
+        flips are lights_out_flips() of every map size, filled on demand.
+    """
+    lines = source['moves']
+    grid = list(itertools.takewhile(LIGHTS_ROW.match, lines))
+    if not grid or len(set(len(row) for row in grid)) != 1:
+        raise ValueError('no lights-out grid in checker output')
+    size = len(grid), len(grid[0])
+    if size not in flips:
+        flips[size] = lights_out_flips(*size)
+    cell_flips = flips[size]
+
+    lights = set((row, col) for row, line in enumerate(grid)
+                 for col, light in enumerate(line) if light == LIGHT_ON)
+
+    # [row, col, turn] of every switched cell
+    changes = []
+    turns = 0
+    for move in itertools.izip(*parse_moves(lines[len(grid):])):
+        if move not in lights:
+            break  # cell is off or off the map, the bot is out
+        turn = LIGHTS_OUT_FIRST_TURN + turns
+        turns += 1
+        switched = cell_flips[move]
+        lights.symmetric_difference_update(switched)
+        changes += [(row, col, turn) for row, col in switched]
+        if not lights:
+            break  # the last bot to move has won
+
+    replay = {
+        'playernames': [x['hacker_username'] for x in source['actors']],
+        'status': ['survived', 'survived'],
+        'replayformat': 'json',
+        'challenge': 'lightsout',
+        'replaydata': {
+            'changes': changes,
+            'revision': 1,
+            'players': 2,
+            'map': {
+                'rows': size[0],
+                'cols': size[1],
+                'data': grid,
+            },
+        },
+        'playerturns': lights_out_player_turns(LIGHTS_OUT_FIRST_TURN + turns - 1),
+    }
+
+    # lights are left, but the match is not a draw by turn limit
+    if lights and source['result']:
+        bot = turns % 2  # this bot crashed, timed out or made invalid move
+        status = source['message'].split('\n')[0]
+        replay['status'][bot] = status
+        # on its next turn, as the engine records it
+        replay['playerturns'][bot] = LIGHTS_OUT_FIRST_TURN + turns
+
+    return replay
+
 
-    if game in CONVERTERS:
-        return CONVERTERS[game](source)
-    return None
+@converter('lights-out')
+def lights_out_convert(sources):
+    fetch_moves(sources)
+    flips = {}  # shared by matches on maps of the same size
+    return [lights_out_replay(source, flips) for source in sources]
@@ -0,0 +1,366 @@
+"""
+    HTTP client for hackerrank.com used by ingest commands.
+
+    Requests go through one keep-alive session from a pool of worker
+    threads. Their rate is limited by a token bucket (HACKERRANK_RATE
+    requests per second), so throughput depends on the rate limit
+    rather than on round-trip time, while hackerrank.com sees no more
+    load than we allow. Failed requests are retried with backoff.
+
+    Responses may be kept in ResponseCache on disk (HACKERRANK_CACHE_DIR),
+    callers choose for how long with ttl argument, so data already
+    fetched is not requested again when DB is rebuilt or replays
+    are converted anew. Callers also tell which responses are valid,
+    an error page is never cached. prune_http_cache command keeps
+    the cache within age and size limits.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from multiprocessing.pool import ThreadPool
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+RATE = 1.0  # requests per second
+WORKERS = 4  # concurrent requests
+RETRIES = 3  # extra attempts for a failed request
+BACKOFF = 2  # seconds before first retry, doubled for every next one
+TIMEOUT = 30  # seconds
+
+# responses worth another try
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# ttl values for cached responses, other ttl is a number of seconds
+NO_CACHE = 0
+FOREVER = None
+
+# name of a cached file, with its directory (see ResponseCache.path)
+DIGEST = re.compile(r'[0-9a-f]{40}\Z')
+
+
+class FetchError(Exception):
+    pass
+
+
+class RateLimiter(object):
+    """ Token bucket: allows bursts of up to `burst` requests
+        and `rate` requests per second on average.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.checked = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.checked) * self.rate)
+            self.checked = now
+
+            # token is taken in advance, caller waits until it is refilled
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+class ResponseCache(object):
+    """ Response bodies on disk.
+
+        Bodies are compressed and stored by SHA-1 of their content,
+        so equal payloads are stored once. Every cached URL has
+        a small index file with the body hash and time it was fetched.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, kind, digest):
+        return os.path.join(self.directory, kind, digest[:2], digest[2:])
+
+    def get(self, url, ttl=FOREVER):
+        """ Body cached for url, None if it is missing or older than ttl """
+        try:
+            with open(self.path('urls', sha1(url))) as f:
+                index = json.load(f)
+            if ttl is not FOREVER and time.time() - index['time'] > ttl:
+                return None
+            with open(self.path('bodies', index['body']), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (IOError, ValueError, KeyError, zlib.error):
+            return None
+
+    def set(self, url, body):
+        digest = sha1(body)
+        path = self.path('bodies', digest)
+        if not os.path.exists(path):
+            write_file(path, zlib.compress(body))
+        write_file(self.path('urls', sha1(url)), json.dumps({
+            'url': url,
+            'body': digest,
+            'time': time.time(),
+        }))
+
+    def files(self, kind):
+        """ {digest: path} of all stored files of a kind """
+        files = {}
+        for root, dirs, names in os.walk(os.path.join(self.directory, kind)):
+            for name in names:
+                digest = os.path.basename(root) + name
+                if DIGEST.match(digest):  # not a file being written
+                    files[digest] = os.path.join(root, name)
+        return files
+
+    def prune(self, max_age=None, max_size=None):
+        """ Remove responses fetched more than max_age seconds ago,
+            then the oldest ones while bodies take more than max_size
+            bytes. Returns number of removed responses.
+        """
+        now = time.time()
+        entries = []  # (time, path, body digest), oldest first
+        for path in self.files('urls').values():
+            try:
+                with open(path) as f:
+                    index = json.load(f)
+                entries.append((index['time'], path, index['body']))
+            except (IOError, ValueError, KeyError):
+                entries.append((0, path, None))  # broken one goes first
+        entries.sort()
+
+        bodies = self.files('bodies')
+        refs = collections.Counter(digest for _, _, digest in entries)
+        sizes = dict((digest, os.path.getsize(path))
+                     for digest, path in bodies.items())
+        for digest in set(bodies) - set(refs):
+            remove_file(bodies[digest])  # left by removed or broken entries
+        size = sum(sizes[digest] for digest in bodies if digest in refs)
+
+        removed = 0
+        for fetched, path, digest in entries:
+            too_old = max_age is not None and now - fetched > max_age
+            too_big = max_size is not None and size > max_size
+            if not too_old and not too_big:
+                break
+            remove_file(path)
+            removed += 1
+            refs[digest] -= 1
+            if not refs[digest] and digest in bodies:
+                remove_file(bodies[digest])
+                size -= sizes[digest]
+        return removed
+
+
+def sha1(data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+def write_file(path, data):
+    """ Write file at once, readers never see it half-written """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            pass  # made by another thread meanwhile
+    fd, temp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.rename(temp, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # removed by another process meanwhile
+
+
+def cached_response(url, body):
+    r = requests.Response()
+    r.url = url
+    r.status_code = 200
+    r.encoding = 'utf-8'
+    r._content = body
+    return r
+
+
+def response_json(r):
+    """ Decoded JSON of a response, None if it is not JSON """
+    try:
+        return r.json()
+    except ValueError:
+        return None
+
+
+class Fetcher(object):
+    def __init__(self, rate=None, workers=None, retries=RETRIES,
+                 backoff=BACKOFF, timeout=TIMEOUT, cache_dir=None):
+        rate = rate or getattr(settings, 'HACKERRANK_RATE', RATE)
+        workers = workers or getattr(settings, 'HACKERRANK_WORKERS', WORKERS)
+        if cache_dir is None:
+            cache_dir = getattr(settings, 'HACKERRANK_CACHE_DIR', None)
+
+        self.limiter = RateLimiter(rate)
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # connections are kept alive and shared by worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        return self._pool
+
+    def get(self, url, params=None, ttl=NO_CACHE, valid=None):
+        """ Response for url, retried on network errors and server failures.
+            Raises FetchError if all attempts fail.
+
+            Successful responses are cached for ttl seconds
+            (FOREVER for data that never changes). If valid(response)
+            is given, only responses it accepts are cached, cached ones
+            it does not accept are fetched again.
+        """
+        use_cache = self.cache is not None and ttl != NO_CACHE
+        if use_cache:
+            full_url = requests.Request('GET', url, params=sorted((params or {}).items()))\
+                .prepare().url
+            body = self.cache.get(full_url, ttl)
+            if body is not None:
+                r = cached_response(full_url, body)
+                if valid is None or valid(r):
+                    return r
+
+        r = self.fetch(url, params)
+        if use_cache and r.status_code == 200 and (valid is None or valid(r)):
+            self.cache.set(full_url, r.content)
+        return r
+
+    def fetch(self, url, params=None):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+
+            self.limiter.acquire()
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                continue
+
+            if r.status_code not in RETRY_STATUSES:
+                return r
+            error = 'HTTP %d' % r.status_code
+
+        raise FetchError('%s: %s' % (url, error))
+
+    def get_json(self, url, params=None, ttl=NO_CACHE, valid=None):
+        """ Decoded JSON response, None if there is no JSON for url.
+            valid(data) accepts data worth caching, see get().
+        """
+        check = valid
+        if check is not None:
+            valid = lambda r: check(response_json(r))
+        return response_json(self.get(url, params, ttl, valid))
+
+    def imap(self, func, items, window=None):
+        """ Results of func(item) for every item, in order of items.
+
+            Calls run concurrently on worker threads, at most `window`
+            of them ahead of the consumer, so it can stop early
+            without fetching everything.
+        """
+        window = window or self.workers * 2
+        items = iter(items)
+        pending = collections.deque()
+
+        for item in items:
+            pending.append(self.pool.apply_async(func, (item,)))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            result = pending.popleft().get()
+            for item in items:
+                pending.append(self.pool.apply_async(func, (item,)))
+                break
+            yield result
+
+    def get_pages(self, url, limit, params=None, key='models', ttl=NO_CACHE):
+        """ All objects of a paginated API list, in order.
+
+            First page gives total number of objects, then the rest
+            of pages are fetched concurrently. Pages are addressed
+            by offset and limit params.
+        """
+        params = dict(params or {}, limit=limit)
+
+        def valid(data):
+            return isinstance(data, dict) and key in data
+
+        def get_page(offset):
+            data = self.get_json(url, dict(params, offset=offset), ttl, valid)
+            if not valid(data):
+                raise FetchError('%s: no %s at offset %d' % (url, key, offset))
+            return data
+
+        first = get_page(0)
+        objects = list(first[key])
+        total = first['total']
+        print 'offset: %d  total: %d' % (len(objects), total)
+
+        # API may give less than asked for
+        step = min(limit, len(objects)) or limit
+        for page in self.imap(get_page, xrange(step, total, step)):
+            objects += page[key]
+            print 'offset: %d  total: %d' % (len(objects), total)
+
+        return objects
+
+
+def unique(objects, key):
+    """ Objects with distinct values of key, first of every value is kept """
+    seen = set()
+    result = []
+    for obj in objects:
+        if obj[key] not in seen:
+            result.append(obj)
+            seen.add(obj[key])
+    return result
+
+
+_fetcher = None
+
+
+def get_fetcher():
+    """ Fetcher shared by all commands of a process """
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = Fetcher()
+    return _fetcher
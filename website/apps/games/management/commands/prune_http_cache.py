@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.games.fetcher import get_fetcher
+
+
+class Command(BaseCommand):
+    help = 'Remove old responses from cache of hackerrank.com responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max_age', type=int,
+                            default=settings.HACKERRANK_CACHE_MAX_AGE,
+                            help='seconds')
+        parser.add_argument('--max_size', type=int,
+                            default=settings.HACKERRANK_CACHE_MAX_SIZE,
+                            help='bytes')
+
+    def handle(self, *args, **options):
+        cache = get_fetcher().cache
+        if cache is None:
+            print 'HTTP cache is disabled'
+            return
+
+        print 'PRUNING HTTP CACHE'
+        print 'dir: %s' % cache.directory
+        print '-----------------------'
+
+        removed = cache.prune(options['max_age'], options['max_size'])
+
+        print '%d responses removed' % removed
+        print '-----------------------'
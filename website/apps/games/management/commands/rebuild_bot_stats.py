@@ -0,0 +1,27 @@
+from django.core import management
+from django.core.management.base import BaseCommand
+
+from apps.games.models import Bot
+from apps.games.stats import rebuild_bot_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount wins/draws/losses of bots from stored matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-g', '--games', nargs='*', type=str)
+
+    def handle(self, *args, **options):
+        bots = Bot.objects.all()
+        if options['games']:
+            bots = bots.filter(game__slug__in=options['games'])
+
+        print 'REBUILDING BOT STATS'
+        print '-----------------------'
+
+        count = rebuild_bot_stats(bots)
+
+        print 'stats of %d bots rebuilt' % count
+        print '-----------------------'
+
+        management.call_command('update_leaderboard')
@@ -0,0 +1,116 @@
+import itertools
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.games.bulk import bulk_update
+from apps.games.cache import bump_data_version
+from apps.games.converters import CONVERTERS, convert_replays
+from apps.games.models import Match
+
+BATCH_SIZE = 2000  # matches loaded from DB and saved at once
+CHUNK_SIZE = 100  # matches converted by a worker at once
+
+
+class Command(BaseCommand):
+    help = 'Convert replays of stored matches again from their stored source, ' \
+           'e.g. after a converter is changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-g', '--games', nargs='*', type=str,
+                            default=sorted(CONVERTERS))
+        parser.add_argument('-j', '--processes', type=int, default=None)
+        parser.add_argument('--from_id', type=int, default=0)
+
+    def handle(self, *args, **options):
+        matches = Match.objects.filter(
+            game__slug__in=options['games'],
+            hk_id__gte=options['from_id'],
+        )
+
+        skipped = matches.filter(source__isnull=True).count()
+        total = matches.count() - skipped
+
+        print 'RECONVERTING REPLAYS'
+        print 'games: %s' % ', '.join(options['games'])
+        print 'matches: %d' % total
+        print 'without stored source (skipped): %d' % skipped
+        print '-----------------------'
+
+        # workers don't need DB, don't let them share our connection
+        connection.close()
+        pool = Pool(options['processes'])
+
+        started = time.time()
+        converted = failed = 0
+        try:
+            # next batch is converted while results of previous one are saved
+            pending = None
+            for batch in iter_sources(matches.filter(source__isnull=False)):
+                chunks = [batch[i:i + CHUNK_SIZE]
+                          for i in xrange(0, len(batch), CHUNK_SIZE)]
+                result = pool.map_async(convert_matches, chunks)
+                if pending is not None:
+                    count, errors = save_replays(pending.get())
+                    converted += count
+                    failed += errors
+                    print_progress(converted, failed, total, started)
+                pending = result
+
+            if pending is not None:
+                count, errors = save_replays(pending.get())
+                converted += count
+                failed += errors
+        finally:
+            pool.close()
+            pool.join()
+
+        print '-----------------------'
+        print '%d replays converted, %d failed' % (converted, failed)
+        print '-----------------------'
+
+        bump_data_version()  # cached pages are outdated now
+
+
+def iter_sources(matches):
+    """ Yields batches of (pk, hk_id, source) in pk order """
+    last_id = 0
+    while True:
+        batch = list(matches.filter(pk__gt=last_id)
+                     .order_by('pk')
+                     .values_list('pk', 'hk_id', 'source')[:BATCH_SIZE])
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1][0]
+
+
+def convert_matches(tasks):
+    """ (pk, hk_id, replay, error) for stored matches, runs in a worker """
+    results = convert_replays([source for _, _, source in tasks])
+    return [(pk, hk_id, replay, '%r' % error if error else None)
+            for (pk, hk_id, _), (replay, error) in zip(tasks, results)]
+
+
+def save_replays(chunks):
+    """ Save converted replays, failed ones are kept as they were """
+    replays = []
+    failed = 0
+    for pk, hk_id, replay, error in itertools.chain.from_iterable(chunks):
+        if error:
+            print 'id: %d    [FAILED]' % hk_id
+            print '    %s' % error
+            failed += 1
+        else:
+            replays.append((pk, replay))
+
+    bulk_update(Match, ['replay'], replays, batch_size=BATCH_SIZE)
+    return len(replays), failed
+
+
+def print_progress(converted, failed, total, started):
+    speed = converted / max(time.time() - started, 0.001)
+    print 'converted: %d/%d   failed: %d   (%d matches/s)' % (
+        converted, total, failed, speed)
@@ -1,20 +1,27 @@
-import requests
+from decimal import Decimal
 
+from django.core import management
 from django.core.management.base import BaseCommand
-import time
+from django.db import transaction
 
+from apps.games.bulk import bulk_update
+from apps.games.fetcher import get_fetcher, unique
 from apps.games.management.commands.const import API_URL
 from apps.games.models import Game, Player, Bot
 
 URL = API_URL + 'challenges/%game%/leaderboard'  # %game% is a game slug
 API_LIMIT = 100  # max number of objects returned by hackerrank API
+CACHE_TTL = 60 * 60  # seconds, leaderboards change all the time
 
-SLEEP_TIME = 1  # seconds between requests
+BATCH_SIZE = 1000  # rows written in one query
+
+SCORE_PLACES = Decimal(10) ** -Bot._meta.get_field('score').decimal_places
 
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('-g', '--games', nargs='*', type=str)
+        parser.add_argument('--skip_leaderboard', action='store_true')
 
     def handle(self, *args, **options):
         if options['games']:
@@ -22,7 +29,8 @@ class Command(BaseCommand):
         else:
             games = Game.objects.all()
 
-        bots_parsed = bots_added = players_added = 0
+        bots_parsed = 0
+        totals = dict.fromkeys(COUNTS, 0)
         for game in games:
             print 'Parsing %s leaderboard' % game.name
 
@@ -30,89 +38,117 @@ class Command(BaseCommand):
             result = parse_bots_data(game, objects)
 
             bots_parsed += len(objects)
-            bots_added += result['bots_added']
-            players_added += result['players_added']
+            for key in COUNTS:
+                totals[key] += result[key]
 
             print '----------------------------------'
 
         print 'bots parsed (total): %d' % bots_parsed
-        print 'bots added (total): %d' % bots_added
-        print 'players added (total): %d' % players_added
+        for key in COUNTS:
+            print '%s (total): %d' % (key.replace('_', ' '), totals[key])
+
+        if not options['skip_leaderboard']:
+            management.call_command('update_leaderboard')
 
 
 def get_bots_data(game):
     url = URL.replace('%game%', game.slug)
-    objects = []
-    offset = 0
 
     print 'url: %s' % url
 
-    while True:
-        params = {
-            'offset': offset,
-            'limit': API_LIMIT,
-            'include_practice': 'true',
-        }
-        r = requests.get(url, params=params)
-        data = r.json()
-        objects += data['models']
-        offset = len(objects)
+    objects = get_fetcher().get_pages(url, API_LIMIT,
+                                      params={'include_practice': 'true'},
+                                      ttl=CACHE_TTL)
+
+    # filter out duplicates (practice and non-practice versions of same bot,
+    # or bots moved to another page while pages were fetched)
+    return unique(objects, 'hacker')
 
-        print 'offset: %d  total: %d' % (offset, data['total'])
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
 
-        if offset >= data['total']:
-            break
+BOT_FIELDS = ['rank', 'score', 'language']
+PLAYER_FIELDS = ['country', 'avatar']
 
-    return objects
+COUNTS = ['bots_created', 'bots_updated', 'bots_unchanged',
+          'players_created', 'players_updated', 'players_unchanged']
 
 
+@transaction.atomic
 def parse_bots_data(game, objects):
-    # filter out duplicates (practice and non-practice versions of same bot)
-    names = set()
-    newlist = []
-    for bot in objects:
-        if bot['hacker'] not in names:
-            newlist.append(bot)
-            names.add(bot['hacker'])
-    objects = newlist
+    """ Save leaderboard of a game, objects are its bots by rank """
+    # bot owners
+    players, player_counts = sync_players(objects)
 
-    bots_added = players_added = 0
+    # bots themselves
+    new = {}  # player id: values of BOT_FIELDS
     for rank, bot in enumerate(objects, 1):
-        # bot owner
-        player, created = update_player(bot)
-        if created:
-            players_added += 1
-
-        # bot itself
-        _, created = update_bot(bot, game, player, rank)
-
-        if created:
-            bots_added += 1
-
-    print 'bots added: %d' % bots_added
-    print 'players added: %d' % players_added
-
-    return {'bots_added': bots_added,
-            'players_added': players_added}
-
-
-def update_player(bot):
-    return Player.objects.update_or_create(
-        name=bot['hacker'],
-        defaults={
-            'country': bot['country'],
-            'avatar': bot['avatar'].split('\\')[0]
-        }
-    )
-
-
-def update_bot(bot, game, player, rank):
-    return Bot.objects.update_or_create(
-        game=game,
-        player=player,
-        defaults={
-            'rank': rank,
-            'score': bot['score'],
-            'language': bot['language'],
-        })
+        new[players[bot['hacker']]] = (rank, to_score(bot['score']),
+                                       bot['language'])
+    bot_counts = sync_rows(Bot.objects.filter(game=game), 'player_id',
+                           BOT_FIELDS, new, game=game)
+
+    result = {}
+    for kind, counts in [('bots', bot_counts), ('players', player_counts)]:
+        for key, count in counts.items():
+            result['%s_%s' % (kind, key)] = count
+
+    for key in COUNTS:
+        print '%s: %d' % (key.replace('_', ' '), result[key])
+
+    return result
+
+
+def sync_players(objects):
+    """ Create and update owners of leaderboard bots.
+
+        Returns {name: player id} and counts of players
+        created, updated and unchanged.
+    """
+    new = {}  # name: values of PLAYER_FIELDS
+    for bot in objects:
+        new[bot['hacker']] = (bot['country'], bot['avatar'].split('\\')[0])
+
+    counts = sync_rows(Player.objects.filter(name__in=new), 'name',
+                       PLAYER_FIELDS, new)
+    players = dict(Player.objects.filter(name__in=new).values_list('name', 'pk'))
+    return players, counts
+
+
+def sync_rows(queryset, key, fields, new, **defaults):
+    """ Make rows of queryset match new values.
+
+        new is {key value: tuple of fields values}. Changed rows
+        are updated and missing ones created (with defaults),
+        both in bulk. Returns counts of rows created, updated
+        and unchanged.
+    """
+    existing = {}  # key value: (pk, fields values)
+    for row in queryset.values_list(key, 'pk', *fields):
+        existing[row[0]] = (row[1], row[2:])
+
+    model = queryset.model
+    created = []
+    for key_value, values in new.items():
+        if key_value not in existing:
+            data = dict(zip(fields, values), **defaults)
+            data[key] = key_value
+            created.append(model(**data))
+
+    updated = [(existing[key_value][0],) + values
+               for key_value, values in new.items()
+               if key_value in existing and existing[key_value][1] != values]
+
+    model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    bulk_update(model, fields, updated, batch_size=BATCH_SIZE)
+
+    return {
+        'created': len(created),
+        'updated': len(updated),
+        'unchanged': len(new) - len(created) - len(updated),
+    }
+
+
+def to_score(value):
+    """ Score from hackerrank as it is stored in DB """
+    if isinstance(value, float):
+        value = repr(value)
+    return Decimal(value).quantize(SCORE_PLACES)
@@ -1,33 +1,20 @@
-import requests
-
 from django.core.management.base import BaseCommand
 
+from apps.games.cache import bump_data_version
+from apps.games.fetcher import get_fetcher, unique
 from apps.games.management.commands.const import API_URL
 from apps.games.models import Game
 
 URL = API_URL + 'challenges/'
 API_LIMIT = 50  # hackerrank API limit for one request
+CACHE_TTL = 60 * 60 * 24  # seconds, new games are rare
 
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        objects = []
-        offset = 0
-
-        while True:
-            params = {
-                'offset': offset,
-                'limit': API_LIMIT,
-            }
-            r = requests.get(URL, params=params)
-            data = r.json()
-            objects += data['models']
-            offset = len(objects)
-
-            print 'offset: %d  total: %d' % (offset, data['total'])
-
-            if offset >= data['total']:
-                break
+        objects = get_fetcher().get_pages(URL, API_LIMIT, ttl=CACHE_TTL)
+        offset = len(objects)
+        objects = unique(objects, 'slug')
 
         # filter out non-game challenges and single player games
         objects = [x for x in objects
@@ -51,3 +38,5 @@ class Command(BaseCommand):
         print 'number of games: %d' % len(objects)
         print 'games added: %d' % games_added
         print Game.objects.all().reverse()[:games_added].reverse()
+
+        bump_data_version()  # cached pages are outdated now
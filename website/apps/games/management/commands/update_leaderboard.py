@@ -0,0 +1,132 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Count
+from django.utils import timezone
+
+from apps.games.bulk import bulk_update
+from apps.games.cache import bump_data_version
+from apps.games.models import Game, Bot, BotStats, Match, Player, Leaderboard
+
+FIELDS = ['score', 'bot_count', 'match_count', 'top1', 'top10']
+
+GAME_FIELDS = ['bot_count', 'leader_id', 'leader_score',
+               'match_count', 'matches_max']
+
+# Player field: Leaderboard field holding its best value
+MAX_FIELDS = {
+    'score': 'score_max',
+    'bot_count': 'bots_max',
+    'match_count': 'matches_max',
+    'top1': 'top1_max',
+    'top10': 'top10_max',
+}
+
+
+class Command(BaseCommand):
+    help = 'Recalculate players leaderboard and games figures ' \
+           'from bots and matches'
+
+    def handle(self, *args, **options):
+        print 'UPDATING LEADERBOARD'
+        print '-----------------------'
+
+        updated = update_leaderboard()
+        print 'players updated: %d' % updated
+
+        updated = update_games_stats()
+        print 'games updated: %d' % updated
+        print '-----------------------'
+
+        bump_data_version()  # cached pages are outdated now
+
+
+def calc_players_stats():
+    # used to check if bot is in Top 10% by score
+    max_scores = dict(Bot.objects.order_by()
+                      .values_list('game')
+                      .annotate(Max('score')))
+
+    players = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    bots = Bot.objects.order_by().values_list(
+        'player', 'game', 'rank', 'score', 'stats__match_count')
+    for player_id, game_id, rank, score, match_count in bots:
+        player = players[player_id]
+        player['score'] += score
+        player['bot_count'] += 1
+        player['match_count'] += match_count or 0
+        if rank == 1:
+            player['top1'] += 1
+        if score >= max_scores[game_id] * Decimal(0.9):
+            player['top10'] += 1  # top 10% of score for this game
+
+    return players
+
+
+@transaction.atomic
+def update_leaderboard():
+    stats = calc_players_stats()
+
+    # save only players whose figures have changed
+    changed = []
+    for row in Player.objects.values_list('pk', *FIELDS):
+        new = stats.get(row[0], dict.fromkeys(FIELDS, 0))
+        new = [new[field] for field in FIELDS]
+        if list(row[1:]) != new:
+            changed.append([row[0]] + new)
+    bulk_update(Player, FIELDS, changed)
+
+    # overall best results
+    leaderboard = Leaderboard.get_solo()
+    for field in FIELDS:
+        best = max([player[field] for player in stats.values()] or [0])
+        setattr(leaderboard, MAX_FIELDS[field], best)
+    leaderboard.updated = timezone.now()
+    leaderboard.save()
+
+    return len(changed)
+
+
+def calc_games_stats():
+    # migration 0015_game_stats has a frozen copy of this,
+    # keep them in sync (GameStatsBackfillTest checks it)
+    bot_counts = dict(Bot.objects.order_by()
+                      .values_list('game')
+                      .annotate(bot_count=Count('*')))
+    match_counts = dict(Match.objects.order_by()
+                        .values_list('game')
+                        .annotate(match_count=Count('*')))
+    matches_max = dict(BotStats.objects.order_by()
+                       .values_list('bot__game')
+                       .annotate(Max('match_count')))
+    leaders = dict((game_id, (player_id, score)) for game_id, player_id, score
+                   in Bot.objects.filter(rank=1)
+                   .values_list('game', 'player', 'score'))
+
+    games = {}
+    for game_id in Game.objects.values_list('pk', flat=True):
+        leader_id, leader_score = leaders.get(game_id, (None, None))
+        games[game_id] = {
+            'bot_count': bot_counts.get(game_id, 0),
+            'leader_id': leader_id,
+            'leader_score': leader_score,
+            'match_count': match_counts.get(game_id, 0),
+            'matches_max': matches_max.get(game_id) or 0,
+        }
+    return games
+
+
+@transaction.atomic
+def update_games_stats():
+    stats = calc_games_stats()
+
+    changed = []
+    for row in Game.objects.values_list('pk', *GAME_FIELDS):
+        new = [stats[row[0]][field] for field in GAME_FIELDS]
+        if list(row[1:]) != new:
+            changed.append([row[0]] + new)
+    bulk_update(Game, GAME_FIELDS, changed)
+
+    return len(changed)
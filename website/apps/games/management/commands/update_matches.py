@@ -1,33 +1,39 @@
 import datetime
+import itertools
 from django.core import management
-from django.db.models import Count
-import requests
+from django.db import transaction
+from django.db.models import Max
 
 from django.core.management.base import BaseCommand
-import time
-from apps.games.converters import convert_replay
+from apps.games import workqueue
+from apps.games.bulk import bulk_update
+from apps.games.converters import convert_replays
+from apps.games.fetcher import get_fetcher, FetchError, FOREVER
 
 from apps.games.management.commands.const import API_URL, HACKERRANK_URL
-from apps.games.models import Game, Match, ParsingInfo, Bot, Opponent
+from apps.games.models import Game, Match, ParsingInfo, Bot, Opponent, MatchTask
+from apps.games.stats import stats_changes, add_match_result, apply_stats_changes
 
 URL = API_URL + 'games/%id%'
 
 #
-# As of October 2015, number of Matches on hackerrank.com
-# is somewhere between these values.
+# As of October 2015, Matches on hackerrank.com have ids above this one.
 #
-# They are used only on initial DB filling, to help find latest Matches.
+# It is used only on initial DB filling with no known Matches yet,
+# to start looking for the latest Match from.
 #
-# If these bounds are no longer correct, it is OK:
-# script will check them and adjust if needed
+# If it is no longer correct, it is OK: search checks it and goes lower.
 #
 LOWER_BOUND = 5000000
-UPPER_BOUND = 6000000
+
+GALLOP_STEP = 1000  # first jump over ids when looking for the upper bound
+PROBE_WINDOW = 3  # ids checked around a probe, ids of some matches are missing
 
 FORWARD = 1
 BACKWARDS = -1
 
-SLEEP_TIME = 1  # seconds between requests
+BATCH_SIZE = 1000  # matches saved in one transaction
+SAVE_EVERY = 100  # fetched matches saved while fetching goes on
 
 parsing = ParsingInfo.get_solo()
 
@@ -42,6 +48,17 @@ class Command(BaseCommand):
                             nargs='?', type=int, default=5, const=5)
 
     def handle(self, *args, **options):
+        # runs started by cron may overlap, one waits for another
+        with workqueue.locked():
+            self.update_matches(options)
+
+        management.call_command('update_leaderboard')
+
+    def update_matches(self, options):
+        # work left by previous run, if it was stopped
+        save_fetched()
+        fetch_queued()
+
         latest_match = parsing.newest_parsed_match
         if latest_match:
             if options['backwards']:
@@ -51,8 +68,8 @@ class Command(BaseCommand):
             else:
                 start = latest_match + 1
                 direction = FORWARD
-            matches = get_matches(start, options['limit'],
-                                  options['fails_limit'], direction)
+            get_matches(start, options['limit'],
+                        options['fails_limit'], direction)
         else:
             print '-----------------------'
             print 'No parsed data in DB yet.'
@@ -64,20 +81,20 @@ class Command(BaseCommand):
             parsing.oldest_parsed_match = latest_match
             parsing.save()
 
-            matches = get_matches(latest_match, options['limit'],
-                                  options['fails_limit'], BACKWARDS)
+            get_matches(latest_match, options['limit'],
+                        options['fails_limit'], BACKWARDS)
 
-        matches += get_broken_matches()
+        queue_broken_matches()
+        fetch_queued()
+        save_fetched()
 
-        print 'SAVING MATCHES'
-        print '-----------------------'
-
-        for match in matches:
-            parse_match(match)
+        saved = workqueue.prune_parsed()
+        failed = MatchTask.objects.filter(status=MatchTask.FAILED).count()
 
         print '-----------------------'
         print 'DONE'
-        print '%d matches was saved or updated in DB' % len(matches)
+        print '%d matches was saved or updated in DB' % saved
+        print '%d matches failed (see MatchTask)' % failed
         print '-----------------------'
 
 
@@ -88,152 +105,326 @@ def get_matches(match_id, limit=100, fails_limit=5, direction=FORWARD):
     print 'fails limit: %s' % fails_limit
     print '-----------------------'
 
-    objects = []
-    checked = failures = 0
-    while checked < limit and failures < fails_limit:
+    # ids are fetched concurrently ahead of this loop,
+    # results still come in order of ids
+    ids = xrange(match_id, match_id + limit * direction, direction)
+    results = get_fetcher().imap(fetch_match, ids)
+    games = set(Game.objects.values_list('slug', flat=True))
+
+    checked = added = failures = 0
+    for match_id, (data, error) in itertools.izip(ids, results):
         print 'id: %d    ' % match_id,
+        checked += 1
 
-        r = requests.get(URL.replace('%id%', str(match_id)))
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
+        if error:
+            # not a missing match, it is retried on next run
+            print '[ERROR]'
+            print error
+            workqueue.mark_fetch_failed(match_id, error)
+            continue
 
-        try:
-            data = r.json()['model']
-        except:
+        if data is None:
             print '[NOT FOUND]'
             failures += 1
             print 'Failures: %d/%d' % (failures, fails_limit)
+            if failures >= fails_limit:
+                break
             continue
-        finally:
-            match_id += direction
-            checked += 1
 
         # match parsed successfully
         failures = 0
-        if direction == FORWARD:
-            parsing.newest_parsed_match = match_id
-        else:
-            parsing.oldest_parsed_match = match_id
 
         # some output to the user
         print '%s     ' % data['challenge_slug'],
-        if Game.objects.filter(slug=data['challenge_slug']).exists():
-            objects.append(data)
+        if data['challenge_slug'] in games:
+            workqueue.mark_fetched(match_id, data)
+            added += 1
             print '[ADDED]'
+
+            if added % SAVE_EVERY == 0:
+                save_fetched()
         else:
             print '[SKIPPED]'
 
+        # progress is saved right away, so next run continues from here
+        if direction == FORWARD:
+            parsing.newest_parsed_match = match_id
+        else:
+            parsing.oldest_parsed_match = match_id
+        parsing.save()
+
         if checked % 10 == 0:
             print '-----------------------'
-            print 'checked: %d   added: %d' % (checked, len(objects))
+            print 'checked: %d   added: %d' % (checked, added)
             print '-----------------------'
 
-    parsing.save()
-
-    return objects
+    return added
 
 
-def get_broken_matches():
+def queue_broken_matches():
     print '-----------------------'
-    print 'GETTING MATCHES WITH MISSING BOTS'
+    print 'QUEUEING MATCHES WITH MISSING BOTS'
     print '-----------------------'
 
-    matches = Match.objects.annotate(
-        bots_num=Count('bots')
-    ).filter(bots_num__lt=2)
+    matches = list(Match.objects.filter(bots_num__lt=2)
+                   .values_list('hk_id', flat=True))
+    workqueue.enqueue(matches)
 
-    print ' matches to fix: %d' % matches.count()
+    print ' matches to fix: %d' % len(matches)
     print '-----------------------'
 
-    objects = []
-    for match in matches:
-        print 'id: %d     %s' % (match.hk_id, match.game)
 
-        r = requests.get(URL.replace('%id%', str(match.hk_id)))
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
+def fetch_queued():
+    """ Fetch pending matches of the queue and failed ones to be retried """
+    ids = workqueue.to_fetch()
+    if not ids:
+        return
 
-        data = r.json()['model']
-        objects.append(data)
+    print '-----------------------'
+    print 'FETCHING %d QUEUED MATCHES' % len(ids)
+    print '-----------------------'
 
-        if len(objects) % 10 == 0:
-            print '-----------------------'
-            print 'matches added: %d' % len(objects)
-            print '-----------------------'
+    results = get_fetcher().imap(fetch_match, ids)
 
-    print '-----------------------'
+    fetched = 0
+    for hk_id, (data, error) in itertools.izip(ids, results):
+        print 'id: %d    ' % hk_id,
 
-    return objects
+        if error or data is None:
+            print '[ERROR]' if error else '[NOT FOUND]'
+            workqueue.mark_fetch_failed(hk_id, error or 'not found')
+            continue
+        print '[FETCHED]'
+
+        workqueue.mark_fetched(hk_id, data)
+        fetched += 1
+
+        if fetched % SAVE_EVERY == 0:
+            save_fetched()
+
+    print '-----------------------'
 
 
-def parse_match(data):
+def fetch_match(match_id):
+    """ (data, None) for a match or (None, error), data is None
+        if there is no such match.
+    """
     try:
-        match, _ = Match.objects.update_or_create(
-            hk_id=data['id'],
-            defaults={
-                'game': Game.objects.get(slug=data['challenge_slug']),
-                'result': data['result'],
-                'message': data['message'],
-                'date': datetime.datetime.fromtimestamp(int(data['updated_at'])),
-                'replay': convert_replay(data),
-            }
-        )
-    except Exception as e:
-        print 'id: %d' % data['id']
-        print 'Failed to parse.\n%s' % e
-        print '------------------------'
-        return
+        return get_match_data(match_id), None
+    except FetchError as e:
+        return None, unicode(e)
 
-    match.bots.clear()
-    for bot_data in data['actors']:
-        try:
-            bot = Bot.objects.get(
-                game=match.game,
-                player__name=bot_data['hacker_username'],
-            )
-            Opponent(
-                match=match,
-                bot=bot,
-                position=bot_data['actor']
-            ).save()
-        except Exception as e:
-            print 'id: %d' % data['id']
-            print 'WARNING: Can not add bot to match'
-            print 'game: %s  player: %s' % (match.game, bot_data['hacker_username'])
-            print 'exception: %s' % e
-            print '-----------------------'
-            print 'Updating bots for this game'
 
-            match.bots.clear()
+def get_match_data(match_id):
+    """ Match data from hackerrank API, None if there is no such match """
+    # data of a finished match never changes,
+    # it is cached once it is there
+    data = get_fetcher().get_json(URL.replace('%id%', str(match_id)),
+                                  ttl=FOREVER, valid=match_model)
+    return match_model(data)
+
+
+def match_model(data):
+    """ Match data of API response, None if it has none """
+    if isinstance(data, dict):
+        return data.get('model')
+    return None
+
 
-            # time to update bots list for this game
-            management.call_command('update_bots',
-                                    games=[data['challenge_slug']])
+def save_fetched(batch_size=BATCH_SIZE):
+    """ Save all fetched matches of the queue, a batch at a time """
+    saved = 0
+    while True:
+        objects = workqueue.fetched(batch_size)
+        if not objects:
             break
 
+        # converting replays and updating bots take a while,
+        # they are done before the transaction
+        matches, opponents, failed = parse_matches_batch(objects)
+        with transaction.atomic():
+            save_matches_batch(matches, opponents)
+            workqueue.mark_parsed(list(matches))
+            for hk_id, error in failed.items():
+                workqueue.mark_parse_failed([hk_id], error)
+
+        saved += len(matches)
+        print 'saved: %d' % saved
+
+    return saved
+
+
+def parse_match(data, games, replay):
+    """ Match fields from hackerrank data """
+    return {
+        'game_id': games[data['challenge_slug']],
+        'result': data['result'],
+        'message': data['message'],
+        'date': datetime.datetime.fromtimestamp(int(data['updated_at'])),
+        'replay': replay,
+        'source': data,  # with anything converter fetched, see reconvert_replays
+    }
+
+
+def find_bots(games, actors):
+    """ {(game id, player name): bot id} for bots of given actors """
+    names = set(actor['hacker_username'] for actor in actors)
+    return {(game_id, name): bot_id for game_id, name, bot_id
+            in Bot.objects.filter(game__in=games, player__name__in=names)
+            .values_list('game', 'player__name', 'pk')}
+
+
+def parse_matches_batch(objects):
+    """ Match fields and opponents from hackerrank API data, bots
+        of unknown players are fetched here. Returns {id: fields},
+        {id: [(bot id, position)]} and {id: error} for failed matches.
+    """
+    games = dict(Game.objects.values_list('slug', 'pk'))
+
+    matches = {}  # hk_id: fields
+    actors = {}  # hk_id: actors data
+    failed = {}  # hk_id: error
+    replays = convert_replays(objects)  # all games of the batch in one pass
+    for data, (replay, error) in zip(objects, replays):
+        if error:
+            # the match is saved without replay, reconvert_replays
+            # converts it from stored source once the converter is fixed
+            print 'id: %d    [NO REPLAY]' % data['id']
+            print '    failed to convert replay: %r' % error
+        try:
+            matches[data['id']] = parse_match(data, games, replay)
+            actors[data['id']] = data['actors']
+        except Exception as e:
+            print 'id: %d' % data['id']
+            print 'Failed to parse.\n%s' % e
+            print '------------------------'
+            failed[data['id']] = 'failed to parse: %r' % e
+
+    # all bots of the batch in one query
+    game_ids = set(fields['game_id'] for fields in matches.values())
+    all_actors = [actor for match_actors in actors.values()
+                  for actor in match_actors]
+    bots = find_bots(game_ids, all_actors)
+
+    missing = set()  # games with bots unknown to us
+    for hk_id, match_actors in actors.items():
+        game_id = matches[hk_id]['game_id']
+        for actor in match_actors:
+            if (game_id, actor['hacker_username']) not in bots:
+                missing.add(game_id)
+    missing = sorted(slug for slug, game_id in games.items() if game_id in missing)
+    if missing:
+        print 'WARNING: Can not add bots to matches'
+        print 'games: %s' % ', '.join(missing)
+        print '-----------------------'
+        print 'Updating bots for these games'
+
+        # time to update bots list for these games,
+        # leaderboard is updated once all matches are saved
+        management.call_command('update_bots', games=missing,
+                                skip_leaderboard=True)
+        bots = find_bots(game_ids, all_actors)
+
+    # matches of bots still missing are saved without them,
+    # queue_broken_matches() retries them on next run
+    opponents = {}  # hk_id: [(bot id, position)]
+    for hk_id, match_actors in actors.items():
+        game_id = matches[hk_id]['game_id']
+        opponents[hk_id] = [(bots[game_id, actor['hacker_username']], actor['actor'])
+                            for actor in match_actors
+                            if (game_id, actor['hacker_username']) in bots]
+
+    return matches, opponents, failed
+
+
+def save_matches_batch(matches, opponents):
+    """ Save parsed matches, new ones and new versions of saved ones,
+        and update bot stats with their results.
+    """
+    changes = stats_changes()
+
+    # results of already saved versions of these matches
+    # are taken back from bot stats
+    saved = dict((hk_id, (pk, result)) for hk_id, pk, result
+                 in Match.objects.filter(hk_id__in=matches)
+                 .values_list('hk_id', 'pk', 'result'))
+    results = dict(saved.values())
+    previous = Opponent.objects.filter(match__in=results)
+    counted = previous.filter(match__bots_num=2)  # see rebuild_bot_stats
+    for match_id, bot_id, position in counted.values_list('match', 'bot', 'position'):
+        add_match_result(changes, results[match_id], bot_id, position, sign=-1)
+
+    # opponents of saved matches are changed only where they differ,
+    # usually a match gets the bot that was missing before
+    stale = {}  # (hk_id, bot id, position): opponent id
+    hk_ids = dict((pk, hk_id) for hk_id, (pk, result) in saved.items())
+    for pk, match_id, bot_id, position in previous.values_list(
+            'pk', 'match', 'bot', 'position'):
+        stale[hk_ids[match_id], bot_id, position] = pk
+    added = [(hk_id, bot_id, position)
+             for hk_id, match_opponents in opponents.items()
+             for bot_id, position in match_opponents
+             if stale.pop((hk_id, bot_id, position), None) is None]
+    if stale:
+        Opponent.objects.filter(pk__in=stale.values()).delete()
+
+    # saved matches are updated in place, new ones are inserted;
+    # bots_num is written here, per-row signals would count it
+    # again for every new opponent (see update_bots_num)
+    fields = sorted(next(iter(matches.values()))) if matches else []
+    bulk_update(Match, fields + ['bots_num'], [
+        [pk] + [matches[hk_id][field] for field in fields] +
+        [len(opponents[hk_id])]
+        for hk_id, (pk, result) in saved.items()
+    ], batch_size=BATCH_SIZE)
+    Match.objects.bulk_create([
+        Match(hk_id=hk_id, bots_num=len(opponents[hk_id]), **fields)
+        for hk_id, fields in matches.items() if hk_id not in saved
+    ], batch_size=BATCH_SIZE)
+
+    # bulk_create gives no ids of new rows
+    ids = dict(Match.objects.filter(hk_id__in=matches).values_list('hk_id', 'pk'))
+    Opponent.objects.bulk_create([
+        Opponent(match_id=ids[hk_id], bot_id=bot_id, position=position)
+        for hk_id, bot_id, position in added
+    ], batch_size=BATCH_SIZE)
+
+    for hk_id, match_opponents in opponents.items():
+        if len(match_opponents) == 2:
+            for bot_id, position in match_opponents:
+                add_match_result(changes, matches[hk_id]['result'], bot_id, position)
+    apply_stats_changes(changes)
+
 
 def find_latest_match():
-    lower, upper = adjust_bounds(LOWER_BOUND, UPPER_BOUND)
+    """ Id of the latest match on hackerrank.com.
 
+        Search starts from the latest id we know, gallops forward
+        with growing steps until a probe finds nothing and then
+        narrows the range; every round probes several ids at once.
+    """
+    lower = known_latest_match()
     print 'FINDING LATEST MATCH'
     print '-----------------------'
+    print 'Known latest match: %d' % lower
 
-    while upper - lower > 1:
-        match_id = (lower + upper) / 2
-        print ' lower: %d \n upper: %d \n check: %d' % \
-              (lower, upper, match_id),
+    lower = find_lower_bound(lower)
+    lower, upper = gallop(lower)
 
-        r = requests.get(URL.replace('%id%', str(match_id)))
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
+    print 'Search bounds: (%d, %d)' % (lower, upper)
+    print '-----------------------'
 
-        try:
-            r.json()
-            print '[FOUND]'
-            lower = match_id
-        except:
-            print '[NOT FOUND]'
-            upper = match_id
+    probes = get_fetcher().workers
+    while upper - lower > 1:
+        # split the range into probes + 1 equal parts
+        step = max((upper - lower) / (probes + 1), 1)
+        ids = range(lower + step, upper, step)[:probes]
+
+        print ' lower: %d \n upper: %d \n check: %s' % (lower, upper, ids)
+        lower, upper = narrow(lower, upper, ids)
         print '-----------------------'
 
-    latest_match = upper - 1
+    latest_match = lower
 
     print 'Latest match: %d' % latest_match
     print URL.replace('%id%', str(latest_match))
@@ -243,55 +434,71 @@ def find_latest_match():
     return latest_match
 
 
-def adjust_bounds(lower, upper):
-    print 'ADJUSTING SEARCH BOUNDS'
-    print '-----------------------'
-    print 'Initial bounds: (%d, %d)' % (lower, upper)
-    print '-----------------------'
+def known_latest_match():
+    """ Latest match id known from previous runs, LOWER_BOUND if none """
+    known = [parsing.newest_parsed_match,
+             Match.objects.aggregate(Max('hk_id'))['hk_id__max'],
+             MatchTask.objects.aggregate(Max('hk_id'))['hk_id__max']]
+    return max(known) or LOWER_BOUND
 
-    # just in case somebody uses this function with lower > upper
-    # (what is meaningless)
-    upper = max(upper, lower)
 
-    print 'Adjusting lower bound...'
-
-    # lower bound is ok if there is a Match for it;
-    # otherwise decrease lower bound until Match is found
+def find_lower_bound(lower):
+    """ Id of a match at or below lower """
     while lower > 0:
-        print 'Checking %d...    ' % lower,
-
-        r = requests.get(URL.replace('%id%', str(lower)))
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
-
-        try:
-            r.json()
-            print '[OK]'
-            break
-        except:
-            print '[NOT OK]'
-            lower /= 2
-
-    print '---------------------'
-    print 'Adjusting upper bound...'
-
-    # upper bound is ok if there is no Match for it;
-    # otherwise increase upper bound as long as Match is found
+        found = probe([lower])[0]
+        if found is not None:
+            return found
+        print 'No matches at %d, going lower' % lower
+        lower /= 2
+    return 0
+
+
+def gallop(lower):
+    """ Bounds of the latest match id: lower is an id of a match,
+        there are no matches at upper and above (as far as probes see).
+    """
+    step = GALLOP_STEP
+    probes = get_fetcher().workers
     while True:
-        print 'Checking %d...    ' % upper,
+        # probes at lower + step, lower + 2 * step, lower + 4 * step...
+        ids = [lower + step * 2 ** i for i in range(probes)]
+        print 'Galloping: %s' % ids
+
+        new_lower, upper = narrow(lower, ids[-1] + 1, ids)
+        if upper <= ids[-1]:
+            return new_lower, upper
+
+        # all probes found matches, go on from the last one
+        lower = new_lower
+        step *= 2 ** probes
+
+
+def narrow(lower, upper, ids):
+    """ Bounds after probing ids between them """
+    found = dict(zip(ids, probe(ids)))
+    for match_id in ids:
+        if found[match_id] is not None:
+            lower = max(lower, found[match_id])
+    for match_id in ids:
+        if found[match_id] is None and lower < match_id < upper:
+            upper = match_id
+    return lower, upper
 
-        r = requests.get(URL.replace('%id%', str(upper)))
-        time.sleep(SLEEP_TIME)  # let's be gentle with hackerrank.com
 
-        try:
-            r.json()
-            print '[NOT OK]'
-            upper *= 2
-        except:
-            print '[OK]'
-            break
+def probe(ids):
+    """ For every id, latest match id in a window starting at it,
+        None if the window has no matches. Windows are probed concurrently.
+    """
+    windows = [range(match_id, match_id + PROBE_WINDOW) for match_id in ids]
+    checked = [match_id for window in windows for match_id in window]
+    exists = dict(zip(checked, get_fetcher().imap(match_exists, checked)))
 
-    print '---------------------'
-    print 'Adjusted bounds: (%d, %d)' % (lower, upper)
-    print '-----------------------'
+    result = []
+    for window in windows:
+        found = [match_id for match_id in window if exists[match_id]]
+        result.append(max(found) if found else None)
+    return result
 
-    return lower, upper
+
+def match_exists(match_id):
+    return get_match_data(match_id) is not None
@@ -0,0 +1,134 @@
+import os
+import sys
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.games.models import Match
+
+# local game engines used to re-simulate stored replays
+ENGINE_DIRS = {
+    'conway': os.path.join(settings.BASE_DIR, '..', 'game-of-life'),
+}
+WORKER_DIR = os.path.join(settings.BASE_DIR, '..', 'worker')
+
+CONWAY_TURNS = 80  # hackerrank default
+
+BATCH_SIZE = 1000  # matches loaded from DB at once
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('-g', '--games', nargs='*', type=str,
+                            default=sorted(ENGINE_DIRS))
+        parser.add_argument('-j', '--processes', type=int, default=None)
+        parser.add_argument('--from_id', type=int, default=0)
+        parser.add_argument('-l', '--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        for slug in options['games']:
+            if slug not in ENGINE_DIRS:
+                print 'No local engine for %s, skipped' % slug
+                continue
+
+            print 'Verifying %s replays' % slug
+            print '-----------------------'
+
+            matches = Match.objects.filter(
+                game__slug=slug,
+                hk_id__gte=options['from_id'],
+                replay__isnull=False,
+            )
+
+            # workers don't need DB, don't let them share our connection
+            connection.close()
+            pool = Pool(options['processes'], init_engine, [slug])
+
+            checked = failed = 0
+            try:
+                tasks = iter_matches(matches, options['limit'])
+                for hk_id, errors in pool.imap_unordered(check_match, tasks, 16):
+                    checked += 1
+                    if errors:
+                        failed += 1
+                        print 'id: %d    [FAILED]' % hk_id
+                        for error in errors:
+                            print '    %s' % error
+
+                    if checked % 1000 == 0:
+                        print 'checked: %d   failed: %d' % (checked, failed)
+            finally:
+                pool.close()
+                pool.join()
+
+            print '-----------------------'
+            print '%d matches checked, %d failed' % (checked, failed)
+            print '-----------------------'
+
+
+def iter_matches(matches, limit=None):
+    """ Yields (hk_id, result, replay) in hk_id order,
+        loading matches from DB in batches.
+    """
+    last_id = -1
+    count = 0
+    while True:
+        batch = list(matches.filter(hk_id__gt=last_id)
+                     .order_by('hk_id')
+                     .values_list('hk_id', 'result', 'replay')[:BATCH_SIZE])
+        if not batch:
+            break
+        for match in batch:
+            if limit is not None and count >= limit:
+                return
+            yield match
+            count += 1
+        last_id = batch[-1][0]
+
+
+engine = {}
+
+
+def init_engine(slug):
+    """ Imports local game engine in a worker process """
+    sys.path.insert(0, ENGINE_DIRS[slug])
+    sys.path.append(WORKER_DIR)
+
+    from lifegame import LifeGame
+    from replaycheck import replay_game
+
+    engine['game_class'] = LifeGame
+    engine['replay_game'] = replay_game
+
+
+def check_match(task):
+    hk_id, result, replay = task
+
+    # converted replays store the status of a crashed bot,
+    # but not the turn it crashed on: that's the turn after the last move
+    replaydata = dict(replay['replaydata'], turns=CONWAY_TURNS)
+    moves = len(replaydata['cells'])
+    status = replay['status']
+    playerturns = [moves + 1 if s != 'survived' else 0 for s in status]
+
+    try:
+        game, errors = engine['replay_game'](engine['game_class'], {
+            'replaydata': replaydata,
+            'status': status,
+            'playerturns': playerturns,
+        })
+    except Exception as e:
+        return hk_id, ['exception: %s' % e]
+
+    scores = game.get_scores()
+    if scores[0] == scores[1]:
+        winner = 0
+    else:
+        winner = 1 if scores[0] > scores[1] else 2
+
+    if winner != result:
+        errors.append('result %d, stored %d (scores: %s)' % (winner, result, scores))
+
+    return hk_id, errors
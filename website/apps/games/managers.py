@@ -1,13 +1,22 @@
 from django.db import models
-from django.db.models import Count
 
 
-class FullMatchManager(models.Manager):
+class MatchManager(models.Manager):
+    def get_queryset(self):
+        queryset = super(MatchManager, self).get_queryset()
+
+        # replay is big and needed only on match page,
+        # use defer(None) to load it; source is for converters only
+        queryset = queryset.defer('replay', 'source')
+
+        return queryset
+
+
+class FullMatchManager(MatchManager):
     def get_queryset(self):
         queryset = super(FullMatchManager, self).get_queryset()
 
-        queryset = queryset.annotate(
-            bots_num=Count('bots')
-        ).filter(bots_num=2)
+        # matches with both bots saved
+        queryset = queryset.filter(bots_num=2)
 
         return queryset
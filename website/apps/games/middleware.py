@@ -0,0 +1,96 @@
+"""
+    Query budget checks.
+
+    Counts SQL queries and their time for every view and warns
+    about queries repeated with different parameters (N+1 pattern).
+    A view may declare its max number of queries with query_budget
+    class attribute (or @query_budget decorator for function views);
+    with QUERY_BUDGET_STRICT setting a view exceeding it fails
+    with QueryBudgetExceeded, so tests catch it.
+"""
+
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+# SQL literals, replaced to get the shape of a query
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """ Declare max number of queries of a function view """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def sql_shape(sql):
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+def repeated_queries(queries, threshold):
+    """ Shapes of queries run at least threshold times, most repeated first """
+    shapes = Counter(sql_shape(query['sql']) for query in queries)
+    return [(shape, count) for shape, count in shapes.most_common()
+            if count >= threshold]
+
+
+class QueryBudgetMiddleware(object):
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            return None
+
+        view = getattr(view_func, 'view_class', view_func)
+        request.query_view = '%s.%s' % (view.__module__, view.__name__)
+        request.query_budget = getattr(view, 'query_budget', None)
+
+        request.query_capture = CaptureQueriesContext(connection)
+        request.query_capture.__enter__()
+        return None
+
+    def process_response(self, request, response):
+        queries = self.stop_capture(request)
+        if queries is None:
+            return response
+
+        count = len(queries)
+        time = sum(float(query['time']) for query in queries)
+        response['X-Query-Count'] = count
+        response['X-Query-Time'] = '%.3f' % time
+        logger.debug('%s: %d queries in %.3fs', request.query_view, count, time)
+
+        threshold = getattr(settings, 'QUERY_BUDGET_REPEATS', 5)
+        for shape, repeats in repeated_queries(queries, threshold):
+            logger.warning('%s: query repeated %d times (N+1?): %s',
+                           request.query_view, repeats, shape)
+
+        budget = request.query_budget
+        if budget is not None and count > budget:
+            message = '%s: %d queries, budget is %d' % (
+                request.query_view, count, budget)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    @staticmethod
+    def stop_capture(request):
+        capture = getattr(request, 'query_capture', None)
+        if capture is None:
+            return None
+        del request.query_capture
+        capture.__exit__(None, None, None)
+        return capture.captured_queries
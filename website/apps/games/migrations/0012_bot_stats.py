@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:24
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Case, When, F
+import django.db.models.deletion
+
+
+def fill_bot_stats(apps, schema_editor):
+    Bot = apps.get_model('games', 'Bot')
+    BotStats = apps.get_model('games', 'BotStats')
+    Opponent = apps.get_model('games', 'Opponent')
+
+    def count_if(**condition):
+        return Sum(Case(When(then=1, **condition),
+                        default=0, output_field=models.IntegerField()))
+
+    results = Opponent.objects.order_by().values('bot').annotate(
+        match_count=Count('*'),
+        wins=count_if(match__result=F('position')),
+        draws=count_if(match__result=0),
+    )
+    results = {row['bot']: row for row in results}
+
+    objects = []
+    for bot_id in Bot.objects.values_list('pk', flat=True):
+        row = results.get(bot_id, {'match_count': 0, 'wins': 0, 'draws': 0})
+        objects.append(BotStats(
+            bot_id=bot_id,
+            wins=row['wins'],
+            draws=row['draws'],
+            losses=row['match_count'] - row['wins'] - row['draws'],
+            match_count=row['match_count'],
+        ))
+    BotStats.objects.bulk_create(objects, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0011_match_replay'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('bot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='games.Bot')),
+            ],
+        ),
+        migrations.RunPython(fill_bot_stats, migrations.RunPython.noop),
+    ]
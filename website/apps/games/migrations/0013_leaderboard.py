@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:26
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+PLAYER_FIELDS = ['score', 'bot_count', 'match_count', 'top1', 'top10']
+
+
+def fill_leaderboard(apps, schema_editor):
+    """ Player figures and their best values,
+        as update_leaderboard command counts them
+    """
+    Bot = apps.get_model('games', 'Bot')
+    Player = apps.get_model('games', 'Player')
+    Leaderboard = apps.get_model('games', 'Leaderboard')
+
+    max_scores = dict(Bot.objects.order_by()
+                      .values_list('game')
+                      .annotate(Max('score')))
+
+    players = defaultdict(lambda: dict.fromkeys(PLAYER_FIELDS, 0))
+    bots = Bot.objects.order_by().values_list(
+        'player', 'game', 'rank', 'score', 'stats__match_count')
+    for player_id, game_id, rank, score, match_count in bots:
+        player = players[player_id]
+        player['score'] += score
+        player['bot_count'] += 1
+        player['match_count'] += match_count or 0
+        if rank == 1:
+            player['top1'] += 1
+        if score >= max_scores[game_id] * Decimal(0.9):
+            player['top10'] += 1
+
+    # plain updates, app code may change after this migration
+    for player_id, player in players.items():
+        Player.objects.filter(pk=player_id).update(**player)
+
+    best = dict((field, max([player[field] for player in players.values()] or [0]))
+                for field in PLAYER_FIELDS)
+    Leaderboard.objects.update_or_create(pk=1, defaults={
+        'score_max': best['score'],
+        'bots_max': best['bot_count'],
+        'matches_max': best['match_count'],
+        'top1_max': best['top1'],
+        'top10_max': best['top10'],
+        'updated': timezone.now(),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0012_bot_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_max', models.DecimalField(decimal_places=12, default=0, max_digits=18)),
+                ('bots_max', models.PositiveIntegerField(default=0)),
+                ('matches_max', models.PositiveIntegerField(default=0)),
+                ('top1_max', models.PositiveIntegerField(default=0)),
+                ('top10_max', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='bot_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='match_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='score',
+            field=models.DecimalField(db_index=True, decimal_places=12, default=0, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='top1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='top10',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:27
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0013_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='bots_num',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE games_match SET bots_num = (
+                SELECT COUNT(*) FROM games_opponent
+                WHERE games_opponent.match_id = games_match.id
+            )
+            """,
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterIndexTogether(
+            name='match',
+            index_together=set([('game', 'bots_num', 'date'), ('bots_num', 'date')]),
+        ),
+    ]
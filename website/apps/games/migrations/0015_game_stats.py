@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_game_stats(apps, schema_editor):
+    """ Game figures, as update_leaderboard command counts them """
+    # a frozen copy of update_leaderboard.calc_games_stats, keep them
+    # giving the same figures (GameStatsBackfillTest checks it)
+    Game = apps.get_model('games', 'Game')
+    Bot = apps.get_model('games', 'Bot')
+    BotStats = apps.get_model('games', 'BotStats')
+    Match = apps.get_model('games', 'Match')
+
+    bot_counts = dict(Bot.objects.order_by()
+                      .values_list('game')
+                      .annotate(bot_count=Count('*')))
+    match_counts = dict(Match.objects.order_by()
+                        .values_list('game')
+                        .annotate(match_count=Count('*')))
+    matches_max = dict(BotStats.objects.order_by()
+                       .values_list('bot__game')
+                       .annotate(Max('match_count')))
+    leaders = dict((game_id, (player_id, score)) for game_id, player_id, score
+                   in Bot.objects.filter(rank=1)
+                   .values_list('game', 'player', 'score'))
+
+    for game_id in Game.objects.values_list('pk', flat=True):
+        leader_id, leader_score = leaders.get(game_id, (None, None))
+        Game.objects.filter(pk=game_id).update(
+            bot_count=bot_counts.get(game_id, 0),
+            leader_id=leader_id,
+            leader_score=leader_score,
+            match_count=match_counts.get(game_id, 0),
+            matches_max=matches_max.get(game_id) or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0014_match_bots_num'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='bot_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='leader',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.Player'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='leader_score',
+            field=models.DecimalField(blank=True, decimal_places=12, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='match_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='matches_max',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_game_stats, migrations.RunPython.noop),
+    ]
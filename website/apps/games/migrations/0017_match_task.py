@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:45
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0016_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hk_id', models.PositiveIntegerField(unique=True)),
+                ('status', models.CharField(choices=[(b'pending', b'Pending'), (b'fetched', b'Fetched'), (b'parsed', b'Parsed'), (b'failed', b'Failed')], default=b'pending', max_length=10)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='matchtask',
+            index_together=set([('status', 'hk_id')]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 21:49
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0017_match_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='source',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Case, When, F
+
+
+def recount_bot_stats(apps, schema_editor):
+    """ Stats counted before only matches with both bots saved were counted,
+        see stats.rebuild_bot_stats
+    """
+    Bot = apps.get_model('games', 'Bot')
+    BotStats = apps.get_model('games', 'BotStats')
+    Opponent = apps.get_model('games', 'Opponent')
+
+    def count_if(**condition):
+        return Sum(Case(When(then=1, **condition),
+                        default=0, output_field=models.IntegerField()))
+
+    results = Opponent.objects.filter(match__bots_num=2).order_by().values('bot').annotate(
+        match_count=Count('*'),
+        wins=count_if(match__result=F('position')),
+        draws=count_if(match__result=0),
+    )
+    results = {row['bot']: row for row in results}
+
+    BotStats.objects.all().delete()
+
+    objects = []
+    for bot_id in Bot.objects.values_list('pk', flat=True):
+        row = results.get(bot_id, {'match_count': 0, 'wins': 0, 'draws': 0})
+        objects.append(BotStats(
+            bot_id=bot_id,
+            wins=row['wins'],
+            draws=row['draws'],
+            losses=row['match_count'] - row['wins'] - row['draws'],
+            match_count=row['match_count'],
+        ))
+    BotStats.objects.bulk_create(objects, batch_size=1000)
+
+    # figures made of match counts, as update_leaderboard makes them
+    schema_editor.execute('''
+        UPDATE games_player SET match_count = COALESCE((
+            SELECT SUM(s.match_count) FROM games_botstats s
+            JOIN games_bot b ON b.id = s.bot_id
+            WHERE b.player_id = games_player.id
+        ), 0)
+    ''')
+    schema_editor.execute('''
+        UPDATE games_game SET matches_max = COALESCE((
+            SELECT MAX(s.match_count) FROM games_botstats s
+            JOIN games_bot b ON b.id = s.bot_id
+            WHERE b.game_id = games_game.id
+        ), 0)
+    ''')
+    schema_editor.execute('''
+        UPDATE games_leaderboard SET matches_max = COALESCE((
+            SELECT MAX(match_count) FROM games_player
+        ), 0)
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0018_match_source'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_bot_stats, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.postgres.fields import JSONField
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from solo.models import SingletonModel
-from apps.games.managers import FullMatchManager
+from apps.games.managers import MatchManager, FullMatchManager
 
 
 class Game(models.Model):
@@ -11,6 +13,15 @@ class Game(models.Model):
     difficulty_text = models.CharField(max_length=200, null=True)
     slug = models.CharField(max_length=200, unique=True)
 
+    # leaderboard and matches figures, see update_leaderboard command
+    bot_count = models.PositiveIntegerField(default=0)
+    leader = models.ForeignKey('Player', null=True, blank=True,
+                               on_delete=models.SET_NULL, related_name='+')
+    leader_score = models.DecimalField(max_digits=15, decimal_places=12,
+                                       null=True, blank=True)
+    match_count = models.PositiveIntegerField(default=0)
+    matches_max = models.PositiveIntegerField(default=0)  # most matches of a bot
+
     class Meta:
         ordering = ['pk']
 
@@ -23,6 +34,14 @@ class Player(models.Model):
     country = models.CharField(max_length=200, null=True)
     avatar = models.URLField()
 
+    # leaderboard figures, see update_leaderboard command
+    score = models.DecimalField(max_digits=18, decimal_places=12,
+                                default=0, db_index=True)
+    bot_count = models.PositiveIntegerField(default=0)
+    match_count = models.PositiveIntegerField(default=0)
+    top1 = models.PositiveIntegerField(default=0)  # bots ranked 1st
+    top10 = models.PositiveIntegerField(default=0)  # bots in top 10% by score
+
     class Meta:
         ordering = ['pk']
 
@@ -44,6 +63,20 @@ class Bot(models.Model):
         return u'%s (%s)' % (self.player, self.game)
 
 
+class BotStats(models.Model):
+    """ Match results of a bot, maintained by update_matches
+        (see apps.games.stats), so pages don't have to count them.
+    """
+    bot = models.OneToOneField(Bot, related_name='stats')
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    match_count = models.PositiveIntegerField(default=0)
+
+    def __unicode__(self):
+        return u'%s: %d/%d/%d' % (self.bot, self.wins, self.draws, self.losses)
+
+
 class Match(models.Model):
     game = models.ForeignKey(Game)
     bots = models.ManyToManyField(Bot, through='Opponent')
@@ -51,13 +84,19 @@ class Match(models.Model):
     message = models.TextField()
     date = models.DateTimeField()
     replay = JSONField(null=True)
+    source = JSONField(null=True)  # hackerrank data replay is converted from
     hk_id = models.PositiveIntegerField(unique=True)  # id on hackerrank.com
+    bots_num = models.PositiveSmallIntegerField(default=0)  # saved Opponents
 
-    objects = models.Manager()
+    objects = MatchManager()
     full_objects = FullMatchManager()
 
     class Meta:
         ordering = ['-date']
+        index_together = [
+            ['bots_num', 'date'],  # all matches list
+            ['game', 'bots_num', 'date'],  # matches of a game
+        ]
 
     def get_bots(self):
         return self.bots.order_by('opponent__position')
@@ -72,6 +111,60 @@ class Opponent(models.Model):
         ordering = ['position']
 
 
+@receiver(post_save, sender=Opponent)
+@receiver(post_delete, sender=Opponent)
+def update_bots_num(sender, instance, **kwargs):
+    Match.objects.filter(pk=instance.match_id).update(
+        bots_num=Opponent.objects.filter(match=instance.match_id).count())
+
+
 class ParsingInfo(SingletonModel):
     oldest_parsed_match = models.PositiveIntegerField(null=True, blank=True)
     newest_parsed_match = models.PositiveIntegerField(null=True, blank=True)
+
+
+class Leaderboard(SingletonModel):
+    """ Best results among all players, used to scale players list bars """
+    score_max = models.DecimalField(max_digits=18, decimal_places=12, default=0)
+    bots_max = models.PositiveIntegerField(default=0)
+    matches_max = models.PositiveIntegerField(default=0)
+    top1_max = models.PositiveIntegerField(default=0)
+    top10_max = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(null=True, blank=True)
+
+
+class DataVersion(SingletonModel):
+    """ Bumped by every command changing site data, see apps.games.cache """
+    version = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(null=True, blank=True)
+
+
+class MatchTask(models.Model):
+    """ Match id in the work queue of update_matches.
+
+        Fetched data is kept here until the match is saved,
+        so a restarted command neither refetches nor loses it.
+    """
+    PENDING = 'pending'
+    FETCHED = 'fetched'
+    PARSED = 'parsed'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (FETCHED, 'Fetched'),
+        (PARSED, 'Parsed'),
+        (FAILED, 'Failed'),
+    )
+
+    hk_id = models.PositiveIntegerField(unique=True)  # id on hackerrank.com
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    data = JSONField(null=True)  # from hackerrank API, until match is parsed
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        index_together = [['status', 'hk_id']]
+
+    def __unicode__(self):
+        return u'%d (%s)' % (self.hk_id, self.status)
@@ -0,0 +1,171 @@
+"""
+    Keyset (seek) pagination.
+
+    Pages are found by the ordering key of their first or last row
+    instead of OFFSET, and no COUNT of the whole list is needed,
+    so every page costs the same as the first one.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def cursor_value(value):
+    """ Key value as JSON has it. Dates and decimals become strings,
+        they stay so after decoding, DB lookups take them as they are.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)  # float would lose precision
+    return value
+
+
+def encode_cursor(direction, values):
+    if values is not None:
+        values = [cursor_value(x) for x in values]
+    data = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """ Returns (direction, values), or None for a broken cursor """
+    try:
+        data = base64.urlsafe_b64decode(str(cursor) + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(data)
+    except (TypeError, ValueError, UnicodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, values
+
+
+def seek_filter(ordering, values, reverse=False):
+    """ Rows following given key values in the ordering
+        (preceding them if reverse is True).
+    """
+    condition = Q()
+    equal = {}
+    for key, value in zip(ordering, values):
+        field = key.lstrip('-')
+        descending = key.startswith('-') != reverse
+        lookup = '%s__%s' % (field, 'lt' if descending else 'gt')
+        condition |= Q(**dict(equal, **{lookup: value}))
+        equal[field] = value
+
+    # bound on the first key lets DB use index range scan
+    field = ordering[0].lstrip('-')
+    descending = ordering[0].startswith('-') != reverse
+    bound = Q(**{'%s__%s' % (field, 'lte' if descending else 'gte'): values[0]})
+
+    return bound & condition
+
+
+def reverse_ordering(ordering):
+    return [key[1:] if key.startswith('-') else '-' + key for key in ordering]
+
+
+class KeysetPage(object):
+    def __init__(self, object_list, has_previous, has_next, paginator):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def first_querystring(self):
+        return self.paginator.querystring(None)
+
+    @property
+    def last_querystring(self):
+        return self.paginator.querystring(encode_cursor(PREVIOUS, None))
+
+    @property
+    def next_querystring(self):
+        values = self.paginator.key_values(self.object_list[-1])
+        return self.paginator.querystring(encode_cursor(NEXT, values))
+
+    @property
+    def previous_querystring(self):
+        values = self.paginator.key_values(self.object_list[0])
+        return self.paginator.querystring(encode_cursor(PREVIOUS, values))
+
+
+class KeysetPaginator(object):
+    """ Paginates queryset by a unique ordering, e.g. ('-date', '-id').
+
+        Pages are addressed by opaque cursors passed in 'cursor'
+        GET parameter, broken or missing cursor gives the first page.
+    """
+    def __init__(self, queryset, per_page, ordering, request=None,
+                 param='cursor'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.request = request
+        self.param = param
+
+    def key_values(self, obj):
+        return [getattr(obj, key.lstrip('-')) for key in self.ordering]
+
+    def querystring(self, cursor):
+        params = self.request.GET.copy() if self.request else {}
+        params.pop(self.param, None)
+        if cursor:
+            params[self.param] = cursor
+        return params.urlencode() if self.request else ''
+
+    def page(self, cursor=None):
+        cursor = decode_cursor(cursor) if cursor else None
+        direction, values = cursor or (NEXT, None)
+        if values is not None and (not isinstance(values, list) or
+                                   len(values) != len(self.ordering)):
+            return self.page()
+
+        try:
+            if direction == NEXT:
+                return self._next_page(values)
+            return self._previous_page(values)
+        except (TypeError, ValueError, ValidationError):
+            return self.page()  # values of wrong type
+
+    def _next_page(self, values):
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(seek_filter(self.ordering, values))
+        rows = list(queryset[:self.per_page + 1])
+        if not rows and values is not None:
+            # went past the end, show the last page instead
+            return self._previous_page(None)
+        return KeysetPage(rows[:self.per_page],
+                          has_previous=values is not None,
+                          has_next=len(rows) > self.per_page,
+                          paginator=self)
+
+    def _previous_page(self, values):
+        queryset = self.queryset.order_by(*reverse_ordering(self.ordering))
+        if values is not None:
+            queryset = queryset.filter(
+                seek_filter(self.ordering, values, reverse=True))
+        rows = list(queryset[:self.per_page + 1])
+        if len(rows) <= self.per_page and values is not None:
+            # reached the beginning, show a full first page instead
+            return self._next_page(None)
+        return KeysetPage(rows[:self.per_page][::-1],
+                          has_previous=len(rows) > self.per_page,
+                          has_next=values is not None,
+                          paginator=self)
@@ -0,0 +1,106 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum, Case, When, F, IntegerField
+from apps.games.models import Bot, BotStats, Opponent
+
+COUNTERS = ['wins', 'draws', 'losses', 'match_count']
+
+
+def outcome(result, position):
+    """ Name of BotStats counter for a bot on given position in a match """
+    if result == 0:
+        return 'draws'
+    elif result == position:
+        return 'wins'
+    return 'losses'
+
+
+def stats_changes():
+    """ Changes of BotStats counters, {bot_id: Counter}, see apply_stats_changes """
+    return defaultdict(Counter)
+
+
+def add_match_result(changes, result, bot_id, position, sign=1):
+    """ Count match result of a bot into changes.
+
+        Use sign=-1 to take back results of a match before it is changed.
+        Only matches with both bots saved are counted, see rebuild_bot_stats.
+    """
+    changes[bot_id][outcome(result, position)] += sign
+    changes[bot_id]['match_count'] += sign
+
+
+def apply_stats_changes(changes):
+    """ Add counted changes to BotStats of their bots.
+
+        Bots with the same changes are updated together,
+        so it takes a few queries for any number of bots.
+    """
+    bot_ids = [bot_id for bot_id, change in changes.items() if any(change.values())]
+
+    # bots without matches may have no stats yet
+    existing = set(BotStats.objects.filter(bot__in=bot_ids)
+                   .values_list('bot', flat=True))
+    BotStats.objects.bulk_create([BotStats(bot_id=bot_id) for bot_id in bot_ids
+                                  if bot_id not in existing], batch_size=1000)
+
+    groups = defaultdict(list)
+    for bot_id in bot_ids:
+        groups[tuple(changes[bot_id][field] for field in COUNTERS)].append(bot_id)
+
+    for change, bots in groups.items():
+        BotStats.objects.filter(bot__in=bots).update(**{
+            field: F(field) + value for field, value in zip(COUNTERS, change)
+        })
+
+
+def get_bot_stats(bot):
+    # bots without matches may have no stats yet
+    try:
+        return bot.stats
+    except BotStats.DoesNotExist:
+        return BotStats(bot=bot)
+
+
+def count_results(opponents):
+    """ Wins, draws and match count for every bot, counted by DB """
+    def count_if(**condition):
+        return Sum(Case(When(then=1, **condition),
+                        default=0, output_field=IntegerField()))
+
+    return opponents.order_by().values('bot').annotate(
+        match_count=Count('*'),
+        wins=count_if(match__result=F('position')),
+        draws=count_if(match__result=0),
+    )
+
+
+@transaction.atomic
+def rebuild_bot_stats(bots=None):
+    """ Recount stats of given bots (all by default) from match history """
+    if bots is None:
+        bots = Bot.objects.all()
+    bot_ids = list(bots.values_list('pk', flat=True))
+
+    # only matches with both bots saved count, as on site pages
+    # (see FullMatchManager)
+    results = count_results(Opponent.objects.filter(bot__in=bot_ids,
+                                                    match__bots_num=2))
+    results = {row['bot']: row for row in results}
+
+    BotStats.objects.filter(bot__in=bot_ids).delete()
+
+    objects = []
+    for bot_id in bot_ids:
+        row = results.get(bot_id, {'match_count': 0, 'wins': 0, 'draws': 0})
+        objects.append(BotStats(
+            bot_id=bot_id,
+            wins=row['wins'],
+            draws=row['draws'],
+            losses=row['match_count'] - row['wins'] - row['draws'],
+            match_count=row['match_count'],
+        ))
+    BotStats.objects.bulk_create(objects, batch_size=1000)
+
+    return len(objects)
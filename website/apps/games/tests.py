@@ -1,3 +1,569 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+
+from apps.games import api, workqueue
+from apps.games.cache import bump_data_version, get_build
+from apps.games.converters import convert_replay, convert_replays
+from apps.games.fetcher import Fetcher, ResponseCache, cached_response, sha1, FOREVER
+from apps.games.management.commands.update_leaderboard import \
+    calc_games_stats, update_leaderboard, update_games_stats
+from apps.games.management.commands.update_matches import \
+    parse_matches_batch, save_matches_batch
+from apps.games.middleware import QueryBudgetMiddleware, QueryBudgetExceeded
+from apps.games.models import Game, Player, Bot, BotStats, Match, MatchTask, Opponent
+from apps.games.pagination import encode_cursor, NEXT, PREVIOUS
+from apps.games.stats import rebuild_bot_stats
+
+GAMES = ['conway', 'lights-out']
+PLAYERS = ['alice', 'bob', 'carol']
+MATCHES = 6  # of every game
+
+
+def create_site_data():
+    """ A couple of games with bots of every player and matches between them """
+    players = [Player.objects.create(name=name, avatar='http://example.com/%s.png' % name)
+               for name in PLAYERS]
+
+    hk_id = 1
+    for slug in GAMES:
+        game = Game.objects.create(name=slug.title(), slug=slug, difficulty=0.5)
+        bots = [Bot.objects.create(game=game, player=player, rank=rank,
+                                   score=Decimal('%d.5' % (10 - rank)), language='python')
+                for rank, player in enumerate(players, 1)]
+
+        for i in range(MATCHES):
+            match = Match.objects.create(
+                game=game, result=i % 3, message='', hk_id=hk_id,
+                date=datetime.datetime(2015, 12, 1) + datetime.timedelta(hours=hk_id))
+            first, second = bots[i % len(bots)], bots[(i + 1) % len(bots)]
+            Opponent.objects.create(match=match, bot=first, position=1)
+            Opponent.objects.create(match=match, bot=second, position=2)
+            hk_id += 1
+
+    rebuild_bot_stats()
+    update_leaderboard()
+    update_games_stats()
+    bump_data_version()
+
+
+# pages are not taken from cache, all their queries are counted
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True,
+                   PAGE_CACHE_TIMEOUT=0)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_site_data()
+
+    def setUp(self):
+        caches['default'].clear()  # template fragments
+
+    def test_pages_within_budget(self):
+        game = {'slug': GAMES[0]}
+        player = {'slug': PLAYERS[0]}
+        match = {'slug': 1}
+        pages = [
+            ('games:index', {}),
+            ('games:game-list', {}),
+            ('games:game-overview', game),
+            ('games:game-bots', game),
+            ('games:game-bots-active', game),
+            ('games:game-matches', game),
+            ('games:player-list', {}),
+            ('games:player-overview', player),
+            ('games:player-bots', player),
+            ('games:player-bots-active', player),
+            ('games:player-bots-challenging', player),
+            ('games:player-matches', player),
+            ('games:match-list', {}),
+            ('games:match-detail', match),
+            ('api-v1:game-list', {}),
+            ('api-v1:game-detail', game),
+            ('api-v1:player-list', {}),
+            ('api-v1:player-detail', player),
+            ('api-v1:bot-list', {}),
+            ('api-v1:match-list', {}),
+            ('api-v1:match-detail', match),
+        ]
+        for name, kwargs in pages:
+            # QueryBudgetExceeded fails the test
+            response = self.client.get(reverse(name, kwargs=kwargs))
+            self.assertEqual(response.status_code, 200, name)
+            self.assertIn('X-Query-Count', response, name)
+
+    def test_budget_exceeded(self):
+        def view(request):
+            list(Game.objects.all())
+            list(Player.objects.all())
+            return HttpResponse()
+        view.query_budget = 1
+
+        middleware = QueryBudgetMiddleware()
+        request = RequestFactory().get('/')
+        middleware.process_view(request, view, (), {})
+        response = view(request)
+        with self.assertRaises(QueryBudgetExceeded):
+            middleware.process_response(request, response)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_budget_exceeded_not_strict(self):
+        def view(request):
+            list(Game.objects.all())
+            list(Player.objects.all())
+            return HttpResponse()
+        view.query_budget = 1
+
+        middleware = QueryBudgetMiddleware()
+        request = RequestFactory().get('/')
+        middleware.process_view(request, view, (), {})
+        response = middleware.process_response(request, view(request))
+        self.assertEqual(response['X-Query-Count'], '2')
+
+
+class PageVersionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_site_data()
+
+    def setUp(self):
+        caches['default'].clear()
+        get_build.cache_clear()
+
+    def tearDown(self):
+        get_build.cache_clear()
+
+    def test_not_modified(self):
+        url = reverse('games:game-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_data(self):
+        url = reverse('games:game-list')
+        etag = self.client.get(url)['ETag']
+        bump_data_version()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_build(self):
+        url = reverse('games:game-list')
+        with self.settings(BUILD_ID='old'):
+            etag = self.client.get(url)['ETag']
+        get_build.cache_clear()
+        with self.settings(BUILD_ID='new'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ApiPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_site_data()
+
+    def setUp(self):
+        caches['default'].clear()
+        self.page_size = api.PAGE_SIZE
+        api.PAGE_SIZE = 2
+
+    def tearDown(self):
+        api.PAGE_SIZE = self.page_size
+
+    def get_pages(self, url):
+        """ Results of every page following 'next' links, and the last page """
+        pages = []
+        while url:
+            page = self.client.get(url).json()
+            pages.append([row['name'] for row in page['results']])
+            url = page['next']
+        return pages, page
+
+    def test_player_pages(self):
+        # players are ordered by score, a decimal
+        players = list(Player.objects.order_by('-score', 'id')
+                       .values_list('name', flat=True))
+        pages, last = self.get_pages(reverse('api-v1:player-list'))
+        self.assertEqual(pages, [players[:2], players[2:]])
+
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([row['name'] for row in previous['results']],
+                         players[:2])
+        self.assertIsNone(previous['previous'])
+
+    def test_broken_cursors(self):
+        players = list(Player.objects.order_by('-score', 'id')
+                       .values_list('name', flat=True))
+        url = reverse('api-v1:player-list')
+        cursors = ['not a cursor',
+                   encode_cursor(NEXT, [{'a': 1}, {'b': 2}]),
+                   encode_cursor(NEXT, ['1.5', [1]]),
+                   encode_cursor(PREVIOUS, ['score', 1]),
+                   encode_cursor(NEXT, ['1.5'])]
+        for cursor in cursors:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200, cursor)
+            self.assertEqual([row['name'] for row in response.json()['results']],
+                             players[:2], cursor)
+
+
+def match_source(hk_id, result, names):
+    """ Match data as hackerrank API gives it, with moves of the checker """
+    return {
+        'id': hk_id,
+        'challenge_slug': GAMES[0],
+        'result': result,
+        'message': 'Timeout',
+        'updated_at': '1450000000',
+        'actors': [{'hacker_username': name, 'actor': position}
+                   for position, name in enumerate(names, 1)],
+        'moves': ['1 1', '2 2'],
+    }
+
+
+class SaveMatchesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_site_data()
+
+    def bot(self, player):
+        return Bot.objects.get(game__slug=GAMES[0], player__name=player).pk
+
+    def bot_stats(self):
+        return sorted(BotStats.objects.values_list(
+            'bot', 'wins', 'draws', 'losses', 'match_count'))
+
+    def assertStatsCounted(self):
+        """ Stats kept by saving equal the ones counted from scratch """
+        stats = self.bot_stats()
+        rebuild_bot_stats()
+        self.assertEqual(stats, self.bot_stats())
+
+    def test_new_matches(self):
+        matches, opponents, failed = parse_matches_batch(
+            [match_source(100, 1, PLAYERS[:2]), match_source(101, 2, PLAYERS[1:])])
+        self.assertEqual(failed, {})
+        save_matches_batch(matches, opponents)
+
+        match = Match.objects.get(hk_id=100)
+        self.assertEqual(match.bots_num, 2)
+        self.assertEqual(match.result, 1)
+        self.assertEqual(match.replay['playernames'], PLAYERS[:2])
+        self.assertEqual(
+            list(match.opponent_set.values_list('bot', 'position')),
+            [(self.bot(PLAYERS[0]), 1), (self.bot(PLAYERS[1]), 2)])
+        self.assertStatsCounted()
+
+    def test_replay_not_converted(self):
+        source = match_source(300, 1, PLAYERS[:2])
+        source['challenge_slug'] = GAMES[1]  # no lights-out grid in moves
+        matches, opponents, failed = parse_matches_batch([source])
+        self.assertEqual(failed, {})
+        save_matches_batch(matches, opponents)
+
+        match = Match.objects.get(hk_id=300)
+        self.assertIsNone(match.replay)
+        self.assertEqual(match.source['moves'], source['moves'])
+        self.assertEqual(match.bots_num, 2)
+
+    def test_saved_matches_updated(self):
+        first, second = self.bot(PLAYERS[0]), self.bot(PLAYERS[1])
+        save_matches_batch({200: parse_matches_batch(
+            [match_source(200, 1, PLAYERS[:2])])[0][200]}, {200: [(first, 1)]})
+        match = Match.objects.get(hk_id=200)
+        self.assertEqual(match.bots_num, 1)
+        self.assertStatsCounted()
+
+        # the missing bot is found, the result is different now
+        matches, opponents, failed = parse_matches_batch(
+            [match_source(200, 2, PLAYERS[:2])])
+        save_matches_batch(matches, opponents)
+        updated = Match.objects.get(hk_id=200)
+        self.assertEqual(updated.pk, match.pk)
+        self.assertEqual(updated.result, 2)
+        self.assertEqual(updated.bots_num, 2)
+        self.assertEqual(
+            sorted(updated.opponent_set.values_list('bot', 'position')),
+            [(first, 1), (second, 2)])
+        self.assertStatsCounted()
+
+        # and another bot played it
+        third = self.bot(PLAYERS[2])
+        matches, opponents, failed = parse_matches_batch(
+            [match_source(200, 1, [PLAYERS[0], PLAYERS[2]])])
+        save_matches_batch(matches, opponents)
+        updated = Match.objects.get(hk_id=200)
+        self.assertEqual(updated.bots_num, 2)
+        self.assertEqual(
+            sorted(updated.opponent_set.values_list('bot', 'position')),
+            [(first, 1), (third, 2)])
+        self.assertStatsCounted()
+
+
+class WorkQueueTest(TestCase):
+    def statuses(self):
+        return dict(MatchTask.objects.values_list('hk_id', 'status'))
+
+    def test_steps(self):
+        workqueue.enqueue([1, 2, 3])
+        self.assertEqual(sorted(workqueue.to_fetch()), [1, 2, 3])
+
+        workqueue.mark_fetched(1, {'id': 1})
+        workqueue.mark_fetched(2, {'id': 2})
+        workqueue.mark_fetch_failed(3, 'timeout')
+        self.assertEqual(workqueue.fetched(10), [{'id': 1}, {'id': 2}])
+        self.assertEqual(workqueue.to_fetch(), [3])
+
+        workqueue.mark_parsed([1])
+        workqueue.mark_parse_failed([2], 'broken')
+        self.assertEqual(self.statuses(), {1: MatchTask.PARSED,
+                                           2: MatchTask.FAILED,
+                                           3: MatchTask.FAILED})
+        self.assertEqual(MatchTask.objects.get(hk_id=2).data, {'id': 2})
+
+        self.assertEqual(workqueue.prune_parsed(), 1)
+        self.assertEqual(sorted(self.statuses()), [2, 3])
+
+    def test_enqueue_queued(self):
+        workqueue.mark_fetch_failed(1, 'timeout')
+        workqueue.enqueue([1, 2])
+        task = MatchTask.objects.get(hk_id=1)
+        self.assertEqual((task.status, task.attempts, task.error),
+                         (MatchTask.PENDING, 0, ''))
+        self.assertEqual(sorted(self.statuses()), [1, 2])
+
+    def test_given_up(self):
+        for _ in range(workqueue.MAX_ATTEMPTS - 1):
+            workqueue.mark_fetch_failed(1, 'timeout')
+            self.assertEqual(workqueue.to_fetch(), [1])
+        workqueue.mark_fetch_failed(1, 'timeout')
+        self.assertEqual(workqueue.to_fetch(), [])
+        self.assertEqual(MatchTask.objects.get(hk_id=1).attempts,
+                         workqueue.MAX_ATTEMPTS)
+
+    def test_locked(self):
+        def try_lock(result):
+            # another run, with its own DB connection
+            cursor = connection.cursor()
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [workqueue.LOCK_KEY])
+            result.append(cursor.fetchone()[0])
+            cursor.execute('SELECT pg_advisory_unlock_all()')
+            connection.close()
+
+        def other_run():
+            result = []
+            thread = threading.Thread(target=try_lock, args=(result,))
+            thread.start()
+            thread.join()
+            return result[0]
+
+        with workqueue.locked():
+            self.assertFalse(other_run())
+        self.assertTrue(other_run())
+
+
+class FakeFetcher(Fetcher):
+    """ Fetcher answering from a dict of url: body instead of hackerrank """
+    def __init__(self, responses, cache_dir):
+        super(FakeFetcher, self).__init__(rate=1000, workers=1, cache_dir=cache_dir)
+        self.responses = responses
+        self.fetched = []
+
+    def fetch(self, url, params=None):
+        self.fetched.append(url)
+        return cached_response(url, self.responses[url])
+
+
+class ResponseCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_valid_responses_cached(self):
+        url = 'http://example.com/match'
+        fetcher = FakeFetcher({url: '{"status": false}'}, self.directory)
+        has_model = lambda data: 'model' in data
+
+        self.assertEqual(fetcher.get_json(url, ttl=FOREVER, valid=has_model),
+                         {'status': False})
+        self.assertIsNone(self.cache.get(url))
+
+        # the match is there now
+        fetcher.responses[url] = '{"model": {}}'
+        for _ in range(2):
+            self.assertEqual(fetcher.get_json(url, ttl=FOREVER, valid=has_model),
+                             {'model': {}})
+        self.assertEqual(fetcher.fetched, [url, url])
+        self.assertEqual(self.cache.get(url), '{"model": {}}')
+
+    def test_invalid_cached_response_fetched_again(self):
+        url = 'http://example.com/match'
+        self.cache.set(url, '{"status": false}')
+        fetcher = FakeFetcher({url: '{"model": {}}'}, self.directory)
+        self.assertEqual(
+            fetcher.get_json(url, ttl=FOREVER, valid=lambda data: 'model' in data),
+            {'model': {}})
+        self.assertEqual(fetcher.fetched, [url])
+
+    def backdate(self, url, age):
+        """ Make the response of url fetched age seconds ago """
+        path = self.cache.path('urls', sha1(url))
+        with open(path) as f:
+            index = json.load(f)
+        index['time'] = time.time() - age
+        with open(path, 'w') as f:
+            json.dump(index, f)
+
+    def test_prune_by_age(self):
+        self.cache.set('old', 'body')
+        self.cache.set('shared', 'body')
+        self.cache.set('new', 'other body')
+        self.backdate('old', 100)
+
+        self.assertEqual(self.cache.prune(max_age=50), 1)
+        self.assertIsNone(self.cache.get('old'))
+        self.assertEqual(self.cache.get('shared'), 'body')  # body is still used
+        self.assertEqual(self.cache.get('new'), 'other body')
+
+    def test_prune_by_size(self):
+        for i in range(6):
+            self.cache.set('url%d' % i, os.urandom(100))
+            self.backdate('url%d' % i, 10 - i)
+        size = os.path.getsize(self.cache.files('bodies').values()[0])
+
+        self.assertEqual(self.cache.prune(max_size=size * 3), 3)
+        self.assertEqual([self.cache.get('url%d' % i) is not None for i in range(6)],
+                         [False, False, False, True, True, True])
+        self.assertEqual(len(self.cache.files('bodies')), 3)
+
+
+def lights_out_source(grid, moves, result=1, message='Timeout'):
+    """ Lights-out match data as hackerrank API gives it, with checker output """
+    return {
+        'id': 1,
+        'challenge_slug': 'lights-out',
+        'result': result,
+        'message': message,
+        'actors': [{'hacker_username': name} for name in PLAYERS[:2]],
+        'moves': grid + moves,
+    }
+
+
+# 2x2 map with one light on, solved by three moves: first player wins
+LIGHTS_OUT_SOLVED = (['10', '00'], ['0 0', '0 1', '1 0'])
+# the second bot switches a cell that is off: it is out, first one wins
+LIGHTS_OUT_CRASHED = (['10', '00'], ['0 0', '1 1'])
+
+LIGHTS_OUT_TURNS = 100  # turn limit, hackerrank replays don't have it
+
+
+def lights_out_engine():
+    """ LightsOut game and replay_game() of local engine, see verify_replays """
+    root = os.path.join(settings.BASE_DIR, '..')
+    for path in (os.path.join(root, 'lights-out'), os.path.join(root, 'worker')):
+        if path not in sys.path:
+            sys.path.append(path)
+    from lightsgame import LightsOut
+    from replaycheck import replay_game
+    return LightsOut, replay_game
+
+
+class LightsOutReplayTest(SimpleTestCase):
+    def replay_game(self, source):
+        """ Game re-simulated from converted replay and problems found """
+        LightsOut, replay_game = lights_out_engine()
+        replay = convert_replay(source)
+        return replay_game(LightsOut, {
+            'replaydata': dict(replay['replaydata'], turns=LIGHTS_OUT_TURNS),
+            'status': replay['status'],
+            'playerturns': replay['playerturns'],
+        })
+
+    def test_solved(self):
+        game, errors = self.replay_game(lights_out_source(*LIGHTS_OUT_SOLVED))
+        self.assertEqual(errors, [])
+        self.assertEqual(game.cutoff, 'rank stabilized')
+        self.assertEqual(game.get_scores(), [100, 0])
+
+    def test_crashed(self):
+        game, errors = self.replay_game(lights_out_source(*LIGHTS_OUT_CRASHED))
+        self.assertEqual(errors, [])
+        self.assertEqual(game.cutoff, 'lone survivor')
+        self.assertEqual(game.get_scores(), [100, 0])
+
+
+class ConvertReplaysTest(SimpleTestCase):
+    def test_mixed_batch(self):
+        conway = dict(match_source(1, 1, PLAYERS[:2]), moves=['1 1', '2 2', '3 3'])
+        solved = lights_out_source(*LIGHTS_OUT_SOLVED)
+        crashed = lights_out_source(*LIGHTS_OUT_CRASHED)
+        broken = lights_out_source([], ['0 0'])  # no grid
+        unknown = dict(conway, challenge_slug='tic-tac-toe')
+        results = convert_replays([conway, solved, unknown, broken, crashed])
+        (conway, _), (solved, _), unknown, broken, (crashed, _) = results
+
+        self.assertEqual(conway['challenge'], 'lifegame')
+        self.assertEqual(conway['playernames'], PLAYERS[:2])
+        self.assertEqual(conway['replaydata']['cells'],
+                         [(1, 1, 1, 0), (2, 2, 2, 1), (3, 3, 3, 0)])
+        # bots had to make 80 turns, the second one did not
+        self.assertEqual(conway['status'], ['survived', 'Timeout'])
+        self.assertEqual(conway['playerturns'], [3, 2])
+
+        self.assertEqual(solved['challenge'], 'lightsout')
+        self.assertEqual(solved['replaydata']['map'],
+                         {'rows': 2, 'cols': 2, 'data': ['10', '00']})
+        self.assertEqual(solved['replaydata']['changes'][:3],
+                         [(0, 0, 2), (0, 1, 2), (1, 0, 2)])
+        self.assertEqual(solved['status'], ['survived', 'survived'])
+        self.assertEqual(solved['playerturns'], [4, 3])
+
+        self.assertEqual(crashed['status'], ['survived', 'Timeout'])
+        self.assertEqual(crashed['playerturns'], [2, 3])
+
+        self.assertEqual(unknown, (None, None))  # no converter for the game
+        replay, error = broken
+        self.assertIsNone(replay)
+        self.assertIsInstance(error, ValueError)
+
+
+class GameStatsBackfillTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_site_data()
+
+    def test_same_as_command(self):
+        migration = importlib.import_module('apps.games.migrations.0015_game_stats')
+        Game.objects.update(bot_count=0, leader=None, leader_score=None,
+                            match_count=0, matches_max=0)
+        migration.fill_game_stats(django_apps, None)
+
+        stats = calc_games_stats()
+        for game in Game.objects.all():
+            self.assertEqual(stats[game.pk], {
+                'bot_count': game.bot_count,
+                'leader_id': game.leader_id,
+                'leader_score': game.leader_score,
+                'match_count': game.match_count,
+                'matches_max': game.matches_max,
+            })
+        self.assertEqual(stats[Game.objects.get(slug=GAMES[0]).pk]['bot_count'],
+                         len(PLAYERS))
@@ -1,46 +1,31 @@
-from collections import defaultdict
-from decimal import Decimal
-from django.db.models import Prefetch, Max, Count, Sum
-from django.views.generic import ListView, DetailView
+from django.db.models import Prefetch
+from django.db.models.expressions import RawSQL
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.functional import SimpleLazyObject
+from django.views.generic import ListView, DetailView, View
 from pure_pagination import Paginator, PageNotAnInteger
-from apps.games.models import Game, Player, Bot, Match, Opponent
+from apps.games.pagination import KeysetPaginator
+from apps.games.models import Game, Player, Bot, Match, Opponent, Leaderboard
+from apps.games.stats import get_bot_stats
 
 
 class GameList(ListView):
     model = Game
+    queryset = Game.objects.select_related('leader')
+    query_budget = 2
 
     def get_context_data(self, **kwargs):
         context = super(GameList, self).get_context_data(**kwargs)
         games = context['game_list']
 
-        # get bot counts for every game
-        bot_counts = Bot.objects.values_list('game')\
-            .annotate(bot_count=Count('*'))\
-            .order_by()
-        bot_counts = defaultdict(int, bot_counts)
-
-        for game in games:
-            game.bot_count = bot_counts[game.id]
-
-        # get match counts for every game
-        match_counts = Match.objects.all().values_list('game')\
-            .annotate(match_count=Count('*'))\
-            .order_by()
-        match_counts = defaultdict(int, match_counts)
-
-        for game in games:
-            game.match_count = match_counts[game.id]
-
-        leaders = Bot.objects.filter(rank=1).select_related('player')
-        leaders = {bot.game_id: bot.player for bot in leaders}
-
+        # bot and match counts, leaders are updated with bots and matches
         game_bots_max = game_matches_max = 0
         if games:
             game_bots_max = max([game.bot_count for game in games])
             game_matches_max = max([game.match_count for game in games])
 
         for game in games:
-            game.leader = leaders[game.id]
             game.difficulty_percent = (1 - game.difficulty) * 100
 
             game.bots_percent = 0
@@ -66,14 +51,7 @@ class GameDetail(DetailView):
         game = super(GameDetail, self).get_object()
 
         game.bots = Bot.objects.filter(game=game)\
-            .select_related('player')\
-            .annotate(match_count=Count('match'))\
-            .prefetch_related(
-                Prefetch(
-                    'opponent_set',
-                    queryset=Opponent.objects.select_related('match')
-                )
-        )
+            .select_related('player', 'stats')
 
         game.matches = Match.full_objects.filter(game=game)\
             .prefetch_related(
@@ -91,7 +69,7 @@ class GameDetail(DetailView):
         game = self.object
 
         context.update({
-            'bots_count': game.bot_set.count(),
+            'bots_count': game.bot_count,
             'last_match': game.match_set.first()
         })
 
@@ -100,16 +78,12 @@ class GameDetail(DetailView):
 
 def calc_bots_stats(bots):
     for bot in bots:
-        # count wins/draws/losses
-        bot.wins = bot.draws = bot.losses = 0
-        for opponent in bot.opponent_set.all():
-            match = opponent.match
-            if match.result == 0:
-                bot.draws += 1
-            elif match.result == opponent.position:
-                bot.wins += 1
-            else:
-                bot.losses += 1
+        # wins/draws/losses are counted on matches update
+        stats = get_bot_stats(bot)
+        bot.wins = stats.wins
+        bot.draws = stats.draws
+        bot.losses = stats.losses
+        bot.match_count = stats.match_count
 
         # calc percentages
         bot.win_percent = bot.draw_percent = bot.loss_percent = 0
@@ -120,12 +94,21 @@ def calc_bots_stats(bots):
             bot.loss_percent = float(bot.losses) / match_count * 100
 
 
+def percent(value, best):
+    """ value as percent of the best one, 0 while the best is unknown
+        (game figures are counted by update_leaderboard)
+    """
+    if not best:
+        return 0
+    return value / best * 100
+
+
 def calc_relative_strength(match, leader_score):
     match.player, match.opponent = list(match.opponent_set.all())
 
     # opponents relative score (%)
-    player_score = match.player.bot.score / leader_score * 100
-    opponent_score = match.opponent.bot.score / leader_score * 100
+    player_score = percent(match.player.bot.score, leader_score)
+    opponent_score = percent(match.opponent.bot.score, leader_score)
     score_delta = (player_score - opponent_score) / 2
     match.player_score = 50 + score_delta
     match.opponent_score = 50 - score_delta
@@ -134,18 +117,19 @@ def calc_relative_strength(match, leader_score):
 class GameOverview(GameDetail):
     bots_limit = 10
     matches_limit = 15
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         context = super(GameOverview, self).get_context_data()
 
         game = self.object
-        leader_score = game.bot_set.first().score
+        leader_score = game.leader_score
 
         # bots stats
         bots = game.bots[:self.bots_limit]
         calc_bots_stats(bots)
         for bot in bots:
-            bot.score_percent = bot.score / leader_score * 100
+            bot.score_percent = percent(bot.score, leader_score)
 
         # matches stats
         matches = game.matches[:self.matches_limit]
@@ -162,6 +146,7 @@ class GameOverview(GameDetail):
 
 class GameBots(GameDetail):
     template_name = 'games/game_bots.html'
+    query_budget = 4
 
     def get_context_data(self, **kwargs):
         context = super(GameBots, self).get_context_data(**kwargs)
@@ -169,15 +154,16 @@ class GameBots(GameDetail):
         bots = game.bots
 
         # paginate
-        page_num = self.request.GET.get('page', 1)
-        page = Paginator(bots, 50, request=self.request).page(page_num)
+        cursor = self.request.GET.get('cursor')
+        page = KeysetPaginator(bots, 50, ['rank', 'id'],
+                               request=self.request).page(cursor)
         bots = page.object_list
 
-        leader_score = game.bot_set.first().score
+        leader_score = game.leader_score
 
         calc_bots_stats(bots)
         for bot in bots:
-            bot.score_percent = bot.score / leader_score * 100
+            bot.score_percent = percent(bot.score, leader_score)
 
         context.update({
             'bot_list': bots,
@@ -189,20 +175,19 @@ class GameBots(GameDetail):
 
 class GameBotsActive(GameDetail):
     template_name = 'games/game_bots_active.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super(GameBotsActive, self).get_context_data(**kwargs)
         game = self.object
-        bots = game.bots.order_by('-match_count')
+        bots = game.bots.order_by('-stats__match_count')
 
         # paginate
         page_num = self.request.GET.get('page', 1)
         page = Paginator(bots, 50, request=self.request).page(page_num)
         bots = page.object_list
 
-        matches_max = game.bot_set.all() \
-            .annotate(match_count=Count('match')) \
-            .aggregate(Max('match_count'))['match_count__max']
+        matches_max = game.matches_max
 
         calc_bots_stats(bots)
         for bot in bots:
@@ -220,6 +205,7 @@ class GameBotsActive(GameDetail):
 
 class GameMatches(GameDetail):
     template_name = 'games/game_matches.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super(GameMatches, self).get_context_data(**kwargs)
@@ -227,11 +213,12 @@ class GameMatches(GameDetail):
         matches = game.matches
 
         # paginate
-        page_num = self.request.GET.get('page', 1)
-        page = Paginator(matches, 50, request=self.request).page(page_num)
+        cursor = self.request.GET.get('cursor')
+        page = KeysetPaginator(matches, 50, ['-date', '-id'],
+                               request=self.request).page(cursor)
         matches = page.object_list
 
-        leader_score = game.bot_set.first().score
+        leader_score = game.leader_score
 
         for match in matches:
             calc_relative_strength(match, leader_score)
@@ -246,98 +233,36 @@ class GameMatches(GameDetail):
 
 class PlayerList(ListView):
     model = Player
-    ordering = ['-score']  # see annotates below
-
-    def get_queryset(self):
-        queryset = super(PlayerList, self).get_queryset()
-
-        queryset = queryset.prefetch_related(
-            Prefetch(
-                'bot_set',
-                to_attr='bots'
-            )
-        ).annotate(
-            score=Sum('bot__score'),
-        )
-
-        return queryset
+    ordering = ['-score', 'pk']
+    query_budget = 4
 
     def get_context_data(self, **kwargs):
         context = super(PlayerList, self).get_context_data(**kwargs)
         players = context['player_list']
 
-        # used to check if bot is in Top 10% by score
-        games = Game.objects.annotate(max_score=Max('bot__score'))
-
-        # calc overall best results
-        bots_max = Player.objects\
-            .annotate(bot_count=Count('bot'))\
-            .aggregate(Max('bot_count'))['bot_count__max']
-
-        matches_max = Player.objects\
-            .annotate(match_count=Count('bot__match'))\
-            .aggregate(Max('match_count'))['match_count__max']
-
-        score_max = Player.objects\
-            .annotate(score=Sum('bot__score'))\
-            .aggregate(Max('score'))['score__max']
-
-        top1_max = Bot.objects.filter(rank=1).values('player_id')\
-            .annotate(top1_count=Count('*'))\
-            .aggregate(Max('top1_count'))['top1_count__max']
-
-        top10_counts = defaultdict(int)
-        for bot in Bot.objects.all():
-            game = next(x for x in games if x.id == bot.game_id)
-            if bot.score >= game.max_score * Decimal(0.9):
-                top10_counts[bot.player_id] += 1  # top 10% by score on this game
-
-        top10_max = 0
-        if top10_counts:
-            top10_max = max(top10_counts.values())
+        # overall best results, updated with bots and matches
+        leaderboard = Leaderboard.get_solo()
 
         # paginate
         page_num = self.request.GET.get('page', 1)
         page = Paginator(players, 50, request=self.request).page(page_num)
         players = page.object_list
 
-        player_ids = [player.id for player in players]
-
-        # absolute stats
-        for player in players:
-            player.top1 = player.top10 = 0
-
-            for bot in player.bots:
-                game = next(x for x in games if x.pk == bot.game_id)
-
-                if bot.rank == 1:
-                    player.top1 += 1
-                if bot.score >= game.max_score * Decimal(0.9):
-                    player.top10 += 1  # top 10% of score for this game
-
-        bot_counts = Bot.objects.order_by()\
-            .filter(player__in=player_ids)\
-            .values('player')\
-            .annotate(bot_count=Count('*'))\
-            .values_list('player', 'bot_count')
-        bot_counts = dict(bot_counts)
         for player in players:
-            player.bot_count = bot_counts[player.id]
-            player.bots_percent = float(player.bot_count) / bots_max * 100
-
-        match_counts = Opponent.objects.order_by()\
-            .filter(bot__player__in=player_ids)\
-            .values('bot__player')\
-            .annotate(match_count=Count('*'))\
-            .values_list('bot__player', 'match_count')
-        match_counts = defaultdict(int, match_counts)
-
-        for player in players:
-            player.score_percent = Decimal(player.score) / score_max * 100
-            player.top1_percent = float(player.top1) / top1_max * 100
-            player.top10_percent = float(player.top10) / top10_max * 100
-            player.match_count = match_counts[player.id]
-            player.matches_percent = float(player.match_count) / matches_max * 100
+            player.score_percent = player.bots_percent = 0
+            player.top1_percent = player.top10_percent = 0
+            player.matches_percent = 0
+
+            if leaderboard.score_max:
+                player.score_percent = player.score / leaderboard.score_max * 100
+            if leaderboard.bots_max:
+                player.bots_percent = float(player.bot_count) / leaderboard.bots_max * 100
+            if leaderboard.top1_max:
+                player.top1_percent = float(player.top1) / leaderboard.top1_max * 100
+            if leaderboard.top10_max:
+                player.top10_percent = float(player.top10) / leaderboard.top10_max * 100
+            if leaderboard.matches_max:
+                player.matches_percent = float(player.match_count) / leaderboard.matches_max * 100
 
         context.update({
             'player_list': players,
@@ -354,11 +279,8 @@ class PlayerDetail(DetailView):
     slug_field = 'name__iexact'
 
     queryset = Player.objects.prefetch_related(
-        Prefetch('bot_set', queryset=Bot.objects.select_related('game')))
-
-    def __init__(self, **kwargs):
-        super(PlayerDetail, self).__init__(**kwargs)
-        self.bot_stats = defaultdict(lambda: defaultdict(int))
+        Prefetch('bot_set',
+                 queryset=Bot.objects.select_related('game', 'stats')))
 
     def get_object(self, queryset=None):
         player = super(PlayerDetail, self).get_object()
@@ -370,47 +292,26 @@ class PlayerDetail(DetailView):
                 'opponent_set',
                 queryset=Opponent.objects.select_related('bot', 'bot__player')
             )
-        ).select_related('game').prefetch_related('game__bot_set')
+        ).select_related('game')
 
         return player
 
     def get_context_data(self, **kwargs):
         context = super(PlayerDetail, self).get_context_data(**kwargs)
 
-        bot_stats = self.bot_stats
-
-        # matches stats
-        matches = self.object.matches
-        for match in matches:
-            # opponents info
-            opponents = list(match.opponent_set.all())
-            if opponents[0].bot.player == self.object:
-                match.player, match.opponent = opponents
-            else:
-                match.player, match.opponent = opponents[::-1]  # reversed
-            match.opponent_name = match.opponent.bot.player.name
-
-            # match result
-            if match.result == 0:
-                match.result_text = 'Draw'
-                bot_stats[match.game]['draws'] += 1
-            elif match.result == match.opponent.position:
-                match.result_text = 'Lost match'
-                bot_stats[match.game]['losses'] += 1
-            else:
-                match.result_text = 'Won match'
-                bot_stats[match.game]['wins'] += 1
-
         # total stats
-        total_wins = sum(bot_stats[bot]['wins'] for bot in bot_stats)
-        total_losses = sum(bot_stats[bot]['losses'] for bot in bot_stats)
-        total_draws = sum(bot_stats[bot]['draws'] for bot in bot_stats)
+        bot_stats = [get_bot_stats(bot) for bot in self.object.bot_set.all()]
+        total_wins = sum(stats.wins for stats in bot_stats)
+        total_losses = sum(stats.losses for stats in bot_stats)
+        total_draws = sum(stats.draws for stats in bot_stats)
+        total_matches = sum(stats.match_count for stats in bot_stats)
         win_percent = 0
-        if matches:
-            win_percent = float(total_wins) / len(matches) * 100
+        if total_matches:
+            win_percent = float(total_wins) / total_matches * 100
 
         context.update({
-            'match_list': matches,
+            'match_list': self.object.matches,
+            'last_match': self.object.matches.first(),
             'wins': total_wins,
             'losses': total_losses,
             'draws': total_draws,
@@ -420,20 +321,39 @@ class PlayerDetail(DetailView):
         return context
 
 
+def add_matches_results(player, matches):
+    for match in matches:
+        # opponents info
+        opponents = list(match.opponent_set.all())
+        if opponents[0].bot.player == player:
+            match.player, match.opponent = opponents
+        else:
+            match.player, match.opponent = opponents[::-1]  # reversed
+        match.opponent_name = match.opponent.bot.player.name
+
+        # match result
+        if match.result == 0:
+            match.result_text = 'Draw'
+        elif match.result == match.opponent.position:
+            match.result_text = 'Lost match'
+        else:
+            match.result_text = 'Won match'
+
+
 def add_matches_stats(matches):
     for match in matches:
         # opponents stats: relative rank (%)
-        game_bots = match.game.bot_set.count()
-        player_rank = float(match.player.bot.rank) / game_bots * 100
-        opponent_rank = float(match.opponent.bot.rank) / game_bots * 100
+        game_bots = match.game.bot_count
+        player_rank = percent(float(match.player.bot.rank), game_bots)
+        opponent_rank = percent(float(match.opponent.bot.rank), game_bots)
         rank_delta = (player_rank - opponent_rank) / 2
         match.player_rank = 50 - rank_delta
         match.opponent_rank = 50 + rank_delta
 
         # opponents stats: relative score (%)
-        leader_score = match.game.bot_set.first().score
-        player_score = match.player.bot.score / leader_score * 100
-        opponent_score = match.opponent.bot.score / leader_score * 100
+        leader_score = match.game.leader_score
+        player_score = percent(match.player.bot.score, leader_score)
+        opponent_score = percent(match.opponent.bot.score, leader_score)
         score_delta = (player_score - opponent_score) / 2
         match.player_score = 50 + score_delta
         match.opponent_score = 50 - score_delta
@@ -444,38 +364,32 @@ def add_matches_stats(matches):
 
 
 class PlayerOverview(PlayerDetail):
+    query_budget = 7
+
     def get_context_data(self, **kwargs):
         context = super(PlayerOverview, self).get_context_data(**kwargs)
 
-        # matches stats
-        matches = self.object.matches
-        add_matches_stats(matches)
+        # matches stats, counted only when
+        # matches table is not taken from template cache
+        def get_matches():
+            matches = self.object.matches
+            add_matches_results(self.object, matches)
+            add_matches_stats(matches)
+            return matches
 
         # bots stats
         bots = self.object.bot_set.all()
+        calc_bots_stats(bots)
         for bot in bots:
-            game_bots = bot.game.bot_set.count()
-            bot.rank_percent = float(bot.rank) / game_bots * 100
+            game_bots = bot.game.bot_count
+            bot.rank_percent = percent(float(bot.rank), game_bots)
             bot.rank_percent = 100 - bot.rank_percent
 
             bot.difficulty_percent = (1 - bot.game.difficulty) * 100
 
-            stats = self.bot_stats[bot.game]
-            match_count = bot.match_set.count()
-
-            bot.wins = stats['wins']
-            bot.draws = stats['draws']
-            bot.losses = stats['losses']
-
-            bot.win_percent = bot.draw_percent = bot.loss_percent = 0
-            if match_count:
-                bot.win_percent = float(bot.wins) / match_count * 100
-                bot.draw_percent = float(bot.draws) / match_count * 100
-                bot.loss_percent = float(bot.losses) / match_count * 100
-
         context.update({
             'bot_list': sorted(bots, key=lambda bot: -bot.rank_percent),
-            'match_list': matches,
+            'match_list': SimpleLazyObject(get_matches),
         })
 
         return context
@@ -483,25 +397,20 @@ class PlayerOverview(PlayerDetail):
 
 class PlayerBots(PlayerDetail):
     template_name = 'games/player_bots.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super(PlayerBots, self).get_context_data(**kwargs)
 
         bots = self.object.bot_set.all()
+        calc_bots_stats(bots)
         for bot in bots:
-            game_bots = bot.game.bot_set.count()
-            bot.rank_percent = float(bot.rank) / game_bots * 100
+            game_bots = bot.game.bot_count
+            bot.rank_percent = percent(float(bot.rank), game_bots)
             bot.rank_percent = 100 - bot.rank_percent
 
-            leader_score = bot.game.bot_set.first().score
-            bot.score_percent = bot.score / leader_score * 100
-
-            stats = self.bot_stats[bot.game]
-            match_count = bot.match_set.count()
-
-            bot.win_percent = 0
-            if match_count:
-                bot.win_percent = float(stats['wins']) / match_count * 100
+            leader_score = bot.game.leader_score
+            bot.score_percent = percent(bot.score, leader_score)
 
         context.update({
             'bot_list': sorted(bots, key=lambda bot: -bot.rank_percent),
@@ -512,30 +421,18 @@ class PlayerBots(PlayerDetail):
 
 class PlayerBotsActive(PlayerDetail):
     template_name = 'games/player_bots_active.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super(PlayerBotsActive, self).get_context_data(**kwargs)
 
         bots = self.object.bot_set.all()
-        matches_max = max([bot.opponent_set.count() for bot in bots])
+        calc_bots_stats(bots)
+        matches_max = max([bot.match_count for bot in bots])
         for bot in bots:
-            match_count = bot.match_set.count()
-
             bot.matches_percent = 0
             if matches_max:
-                bot.matches_percent = float(match_count) / matches_max * 100
-
-            stats = self.bot_stats[bot.game]
-
-            bot.wins = stats['wins']
-            bot.draws = stats['draws']
-            bot.losses = stats['losses']
-
-            bot.win_percent = bot.draw_percent = bot.loss_percent = 0
-            if match_count:
-                bot.win_percent = float(bot.wins) / match_count * 100
-                bot.draw_percent = float(bot.draws) / match_count * 100
-                bot.loss_percent = float(bot.losses) / match_count * 100
+                bot.matches_percent = float(bot.match_count) / matches_max * 100
 
         context.update({
             'bot_list': sorted(bots, key=lambda bot: -bot.matches_percent),
@@ -546,20 +443,21 @@ class PlayerBotsActive(PlayerDetail):
 
 class PlayerBotsChallenging(PlayerDetail):
     template_name = 'games/player_bots_challenging.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super(PlayerBotsChallenging, self).get_context_data(**kwargs)
 
         # bots stats
         bots = self.object.bot_set.all()
-        game_bots_max = max([bot.game.bot_set.count() for bot in bots])
+        game_bots_max = max([bot.game.bot_count for bot in bots])
         for bot in bots:
-            game_bots = bot.game.bot_set.count()
-            bot.game_bots_percent = float(game_bots) / game_bots_max * 100
+            game_bots = bot.game.bot_count
+            bot.game_bots_percent = percent(float(game_bots), game_bots_max)
 
             bot.difficulty_percent = (1 - bot.game.difficulty) * 100
 
-            bot.rank_percent = float(bot.rank) / game_bots * 100
+            bot.rank_percent = percent(float(bot.rank), game_bots)
             bot.rank_percent = 100 - bot.rank_percent
 
         context.update({
@@ -571,16 +469,19 @@ class PlayerBotsChallenging(PlayerDetail):
 
 class PlayerMatches(PlayerDetail):
     template_name = 'games/player_matches.html'
+    query_budget = 7
 
     def get_context_data(self, **kwargs):
         context = super(PlayerMatches, self).get_context_data(**kwargs)
         matches = self.object.matches
 
         # paginate
-        page_num = self.request.GET.get('page', 1)
-        page = Paginator(matches, 50, request=self.request).page(page_num)
+        cursor = self.request.GET.get('cursor')
+        page = KeysetPaginator(matches, 50, ['-date', '-id'],
+                               request=self.request).page(cursor)
         matches = page.object_list
 
+        add_matches_results(self.object, matches)
         add_matches_stats(matches)
 
         context.update({
@@ -594,6 +495,7 @@ class PlayerMatches(PlayerDetail):
 class MatchList(ListView):
     model = Match
     ordering = ['-date']
+    query_budget = 3
 
     def get_queryset(self):
         queryset = Match.full_objects.all()
@@ -603,12 +505,7 @@ class MatchList(ListView):
                 'opponent_set',
                 queryset=Opponent.objects.select_related('bot', 'bot__player')
             )
-        ).prefetch_related(
-            Prefetch(
-                'game',
-                queryset=Game.objects.prefetch_related('bot_set')
-            )
-        )
+        ).select_related('game')
 
         return queryset
 
@@ -616,8 +513,9 @@ class MatchList(ListView):
         context = super(MatchList, self).get_context_data(**kwargs)
         matches = context['match_list']
 
-        page_num = self.request.GET.get('page', 1)
-        page = Paginator(matches, 50, request=self.request).page(page_num)
+        cursor = self.request.GET.get('cursor')
+        page = KeysetPaginator(matches, 50, ['-date', '-id'],
+                               request=self.request).page(cursor)
         matches = page.object_list
 
         for match in matches:
@@ -634,8 +532,9 @@ class MatchList(ListView):
 
 class MatchDetail(DetailView):
     slug_field = 'hk_id'
+    query_budget = 3
 
-    queryset = Match.objects.select_related(
+    queryset = Match.objects.defer(None).defer('source').select_related(
         'game'
     ).prefetch_related(
         Prefetch(
@@ -649,12 +548,27 @@ class MatchDetail(DetailView):
 
         match = self.object
 
-        game_bots = match.game.bot_set.count()
-        leader_score = match.game.bot_set.first().score
+        game_bots = match.game.bot_count
+        leader_score = match.game.leader_score
         for opponent in match.opponent_set.all():
             bot = opponent.bot
-            bot.rank_percent = float(bot.rank) / game_bots * 100
+            bot.rank_percent = percent(float(bot.rank), game_bots)
             bot.rank_percent = 100 - bot.rank_percent
-            bot.score_percent = bot.score / leader_score * 100
+            bot.score_percent = percent(bot.score, leader_score)
 
         return context
+
+
+class MatchReplay(View):
+    query_budget = 2
+
+    def get(self, request, slug):
+        # stored JSON is sent as DB gives it, without decoding it
+        # into python objects and encoding back
+        replay = get_object_or_404(
+            Match.objects.exclude(replay=None).annotate(
+                replay_text=RawSQL('replay::text', ())
+            ).values_list('replay_text', flat=True),
+            hk_id=slug
+        )
+        return HttpResponse(replay, content_type='application/json')
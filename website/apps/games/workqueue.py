@@ -0,0 +1,99 @@
+"""
+    Work queue of match ids for update_matches, see MatchTask.
+
+    A match id goes pending -> fetched -> parsed, or to failed with
+    the reason; failed ids are retried until MAX_ATTEMPTS. Every step
+    is written as soon as it happens, so the command may be stopped
+    at any moment and continues from the same point on next run.
+
+    Runs of update_matches (cron runs it forwards and backwards) hold
+    the queue with locked(), so no two of them work on the same ids.
+    Parsed ids are pruned at the end of a run, only ids still in work
+    or failed ones stay in the queue.
+"""
+
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import F
+
+from apps.games.models import MatchTask
+
+MAX_ATTEMPTS = 5  # fetches of an id before it is given up
+LOCK_KEY = 20151201  # of DB advisory lock held by a run
+
+
+@contextmanager
+def locked(using='default'):
+    """ Hold the queue while the block runs, other runs wait for it.
+        The lock is of DB session, it is gone with the connection
+        if the run dies.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_KEY])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
+
+
+def enqueue(hk_ids):
+    """ Put match ids to the queue as pending, already queued ones too """
+    hk_ids = set(hk_ids)
+    queued = set(MatchTask.objects.filter(hk_id__in=hk_ids)
+                 .values_list('hk_id', flat=True))
+    MatchTask.objects.filter(hk_id__in=queued).update(
+        status=MatchTask.PENDING, attempts=0, error='')
+    MatchTask.objects.bulk_create([MatchTask(hk_id=hk_id)
+                                   for hk_id in hk_ids - queued])
+
+
+def to_fetch():
+    """ Ids of pending matches and failed ones worth another try """
+    return list(
+        MatchTask.objects.filter(status=MatchTask.PENDING).values_list('hk_id', flat=True)
+    ) + list(
+        MatchTask.objects.filter(status=MatchTask.FAILED, attempts__lt=MAX_ATTEMPTS)
+        .values_list('hk_id', flat=True)
+    )
+
+
+def fetched(limit):
+    """ Data of up to limit fetched matches, in order of ids """
+    return list(MatchTask.objects.filter(status=MatchTask.FETCHED)
+                .order_by('hk_id').values_list('data', flat=True)[:limit])
+
+
+def mark_fetched(hk_id, data):
+    set_status(hk_id, MatchTask.FETCHED, data=data)
+
+
+def mark_fetch_failed(hk_id, error):
+    set_status(hk_id, MatchTask.FAILED, error=error)
+
+
+def mark_parsed(hk_ids):
+    MatchTask.objects.filter(hk_id__in=hk_ids).update(
+        status=MatchTask.PARSED, data=None, error='')
+
+
+def prune_parsed():
+    """ Remove parsed ids from the queue, returns how many were there """
+    return MatchTask.objects.filter(status=MatchTask.PARSED).delete()[0]
+
+
+def mark_parse_failed(hk_ids, error):
+    # data is kept to see what went wrong
+    MatchTask.objects.filter(hk_id__in=hk_ids).update(
+        status=MatchTask.FAILED, error=error)
+
+
+def set_status(hk_id, status, data=None, error=''):
+    """ New status of a fetch attempt, the id is queued if needed """
+    updated = MatchTask.objects.filter(hk_id=hk_id).update(
+        status=status, data=data, error=error, attempts=F('attempts') + 1)
+    if not updated:
+        MatchTask.objects.create(hk_id=hk_id, status=status, data=data,
+                                 error=error, attempts=1)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python2
+""" Benchmarks of replay converters, on batches of made up sources """
+from __future__ import print_function
+import os
+import random
+import sys
+
+from apps.games import converters
+
+sys.path.append("../worker")
+try:
+    from benchmarking import Benchmark, main
+except ImportError:
+    # this can happen if we're launched with cwd outside our own dir
+    # get our full path, then work relative from that
+    cmd_folder = os.path.dirname(os.path.abspath(__file__))
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    sys.path.append(cmd_folder + "/../worker")
+    # try again
+    from benchmarking import Benchmark, main
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmark_baseline.json')
+
+BATCH = 100  # sources converted by one op
+LIGHTS_OUT_SIZES = (8, 16)
+SEED = 42
+
+ACTORS = [{'hacker_username': u'first'}, {'hacker_username': u'second'}]
+
+
+def conway_source(rnd, turns=converters.CONWAY_TURNS_REQUIRED):
+    return {
+        'challenge_slug': u'conway',
+        'message': u'Timeout\n',
+        'result': 1,
+        'actors': ACTORS,
+        'moves': [u'%d %d' % (rnd.randrange(converters.CONWAY_ROWS),
+                              rnd.randrange(converters.CONWAY_COLS))
+                  for _ in range(turns)],
+    }
+
+
+def lights_out_source(rnd, size):
+    """ Random map, players always switch the first cell that is on """
+    grid = [''.join(rnd.choice('01') for _ in range(size)) for _ in range(size)]
+    flips = converters.lights_out_flips(size, size)
+    lights = set((row, col) for row in range(size) for col in range(size)
+                 if grid[row][col] == '1')
+    moves = []
+    while lights:
+        move = min(lights)
+        lights.symmetric_difference_update(flips[move])
+        moves.append(u'%d %d ' % move)
+    return {
+        'challenge_slug': u'lights-out',
+        'message': u'',
+        'result': 1,
+        'actors': ACTORS,
+        'moves': [unicode(row) for row in grid] + moves,
+    }
+
+
+def conway_setup():
+    rnd = random.Random(SEED)
+    return [conway_source(rnd) for _ in range(BATCH)]
+
+
+def conway_crashed_setup():
+    """ Bots crashed half way, with a line that is not a move """
+    sources = conway_setup()
+    for source in sources:
+        source['moves'][len(source['moves']) / 2] = u'Segmentation fault'
+    return sources
+
+
+def lights_out_setup(size):
+    def setup():
+        rnd = random.Random(SEED)
+        return [lights_out_source(rnd, size) for _ in range(BATCH)]
+    return setup
+
+
+def mixed_setup():
+    rnd = random.Random(SEED)
+    sources = [conway_source(rnd) for _ in range(BATCH / 2)]
+    sources += [lights_out_source(rnd, 16) for _ in range(BATCH / 2)]
+    rnd.shuffle(sources)
+    return sources
+
+
+def convert_run(game):
+    convert = converters.CONVERTERS[game]
+    return lambda sources: convert(sources)
+
+
+def convert_replays_run(sources):
+    converters.convert_replays(sources)
+
+
+BENCHMARKS = [
+    Benchmark('conway/%d' % BATCH, conway_setup, convert_run('conway')),
+    Benchmark('conway_crashed/%d' % BATCH, conway_crashed_setup, convert_run('conway')),
+]
+for size in LIGHTS_OUT_SIZES:
+    BENCHMARKS.append(Benchmark('lights-out/%d/%d' % (size, BATCH),
+                                lights_out_setup(size), convert_run('lights-out')))
+BENCHMARKS.append(Benchmark('mixed/%d' % BATCH, mixed_setup, convert_replays_run))
+
+if __name__ == "__main__":
+    sys.exit(main(BENCHMARKS, BASELINE, sys.argv[1:]))
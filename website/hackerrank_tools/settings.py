@@ -53,8 +53,30 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.games.middleware.QueryBudgetMiddleware',
 )
 
+# Queries count per view, see apps/games/middleware.py
+QUERY_BUDGET_ENABLED = DEBUG or os.environ.get('QUERY_BUDGET') == 'True'
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == 'True'
+QUERY_BUDGET_REPEATS = 5  # same query run this many times is reported
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'apps.games.middleware': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if DEBUG else 'WARNING',
+        },
+    },
+}
+
 ROOT_URLCONF = 'hackerrank_tools.urls'
 
 TEMPLATES = [
@@ -70,6 +92,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.games.cache.data_version',
             ],
         },
     },
@@ -102,6 +125,34 @@ DATABASES = {
 # Enable Connection Pooling (if desired)
 # DATABASES['default']['ENGINE'] = 'django_postgrespool'
 
+# Cache of rendered pages, see apps/games/cache.py
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'hackerrank-tools'),
+    }
+}
+
+PAGE_CACHE = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24  # seconds, 0 disables page cache
+# part of page ETags and cache keys, so a deploy outdates cached pages;
+# empty value means a hash of the deployed code
+BUILD_ID = os.environ.get('BUILD_ID', '')
+
+# Requests to hackerrank.com made by commands, see apps/games/fetcher.py
+HACKERRANK_RATE = float(os.environ.get('HACKERRANK_RATE', 1))  # per second
+HACKERRANK_WORKERS = int(os.environ.get('HACKERRANK_WORKERS', 4))
+# fetched data is kept here, empty value disables the cache;
+# on OpenShift only the data dir outlives a deploy
+HACKERRANK_CACHE_DIR = os.environ.get('HACKERRANK_CACHE_DIR', os.path.join(
+    os.environ.get('OPENSHIFT_DATA_DIR', BASE_DIR), 'http_cache'))
+# limits kept by prune_http_cache command
+HACKERRANK_CACHE_MAX_AGE = int(os.environ.get('HACKERRANK_CACHE_MAX_AGE',
+                                              60 * 60 * 24 * 90))  # seconds
+HACKERRANK_CACHE_MAX_SIZE = int(os.environ.get('HACKERRANK_CACHE_MAX_SIZE',
+                                               200 * 2 ** 20))  # bytes
+
 # Honor the 'X-Forwarded-Proto' header for request.is_secure()
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
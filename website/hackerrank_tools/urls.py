@@ -5,5 +5,6 @@ from django.contrib import admin
 urlpatterns = patterns(
     '',
     url(r'^', include('apps.games.urls', namespace='games')),
+    url(r'^api/v1/', include('apps.games.api_urls', namespace='api-v1')),
     url(r'^admin/', include(admin.site.urls)),
 )
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from optparse import OptionParser
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # python 2, allocations are not measured
+
+
+class Benchmark(object):
+    """ A single operation to time
+
+        setup() returns the state passed to every run(state) call,
+        run must leave the state ready for the next call.
+    """
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def measure(benchmark, min_time=0.2, repeat=5):
+    """ Best ops/sec of several timed loops
+
+        With tracemalloc (python 3) also reports the peak memory allocated
+        by one op and the number of memory blocks it left allocated.
+    """
+    state = benchmark.setup()
+    benchmark.run(state)  # warm up caches
+
+    # find a number of ops taking at least min_time
+    number = 1
+    while True:
+        elapsed = _time(benchmark, state, number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed < min_time / 10 else 10
+        number = min(number, 1000000)
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time(benchmark, state, number))
+
+    result = {'ops_per_sec': number / best, 'number': number}
+    if tracemalloc is not None:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        benchmark.run(state)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = after.compare_to(before, 'filename')
+        result['retained_blocks'] = sum(max(s.count_diff, 0) for s in stats)
+        result['alloc_peak_kb'] = peak / 1024.0
+    return result
+
+
+def _time(benchmark, state, number):
+    run = benchmark.run
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.time()
+        for _ in range(number):
+            run(state)
+        return time.time() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def compare(result, baseline, tolerance):
+    """ Regressions of a result against its baseline """
+    problems = []
+    if result['ops_per_sec'] < baseline['ops_per_sec'] * (1 - tolerance):
+        problems.append('%.1f%% slower' %
+                        (100 - 100 * result['ops_per_sec'] / baseline['ops_per_sec']))
+    # small absolute slack, tracemalloc itself is a bit noisy
+    for key, slack in (('retained_blocks', 10), ('alloc_peak_kb', 1)):
+        if result.get(key) is not None and baseline.get(key) is not None \
+                and result[key] > baseline[key] * (1 + tolerance) + slack:
+            problems.append('%s %s, baseline %s' % (key, result[key], baseline[key]))
+    return problems
+
+
+def interpreter():
+    ''' Results are only comparable between the same kind of interpreter '''
+    return '%s %s' % (platform.python_implementation(),
+                      '.'.join(platform.python_version_tuple()[:2]))
+
+
+def main(benchmarks, baseline_path, argv):
+    usage = "Usage: %prog [options] [benchmark_name_prefix ...]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("--save", dest="save",
+                      action="store_true", default=False,
+                      help="Store the results as the new baseline")
+    parser.add_option("--baseline", dest="baseline", default=baseline_path,
+                      help="Baseline file, default %default")
+    parser.add_option("--tolerance", dest="tolerance",
+                      default=0.2, type="float",
+                      help="Allowed slowdown before reporting a regression")
+    parser.add_option("--min_time", dest="min_time",
+                      default=0.2, type="float",
+                      help="Minimal duration of every timed loop, in seconds")
+    parser.add_option("--repeat", dest="repeat",
+                      default=5, type="int",
+                      help="Number of timed loops, the best one is reported")
+    (opts, args) = parser.parse_args(argv)
+
+    # baselines of every interpreter are kept side by side
+    baselines = {}
+    if os.path.exists(opts.baseline):
+        with open(opts.baseline, 'r') as f:
+            baselines = json.load(f)
+    baseline = baselines.get(interpreter(), {})
+    if not baseline:
+        print('# no baseline for %s yet' % interpreter())
+
+    results = {}
+    regressions = 0
+    print('{0:<36} {1:>12} {2:>10} {3:>10}  {4}'.format(
+        'benchmark', 'ops/sec', 'retained', 'peak KiB', 'vs baseline'))
+    for benchmark in benchmarks:
+        if args and not any(benchmark.name.startswith(prefix) for prefix in args):
+            continue
+        result = measure(benchmark, opts.min_time, opts.repeat)
+        results[benchmark.name] = result
+
+        base = baseline.get(benchmark.name)
+        if base is None:
+            status = 'new'
+        else:
+            problems = compare(result, base, opts.tolerance)
+            change = 100 * result['ops_per_sec'] / base['ops_per_sec'] - 100
+            status = '%+.1f%%' % change
+            if problems:
+                regressions += 1
+                status += '  REGRESSION: ' + ', '.join(problems)
+        print('{0:<36} {1:>12.1f} {2:>10} {3:>10}  {4}'.format(
+            benchmark.name, result['ops_per_sec'],
+            result.get('retained_blocks', '-'),
+            '%.1f' % result['alloc_peak_kb'] if 'alloc_peak_kb' in result else '-',
+            status))
+        sys.stdout.flush()
+
+    if opts.save:
+        baseline.update(results)
+        baselines[interpreter()] = baseline
+        with open(opts.baseline, 'w') as f:
+            json.dump(baselines, f, sort_keys=True, indent=1, separators=(',', ': '))
+        print('# baseline saved to %s' % opts.baseline)
+        return 0
+
+    if regressions:
+        print('# %d regressions' % regressions)
+    return 1 if regressions else 0
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import os
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+CACHE_VERSION = 1
+
+# corpora already loaded by this process, (path, cache name) -> MapCorpus
+_corpora = {}
+
+
+class MapCorpus(object):
+    """ Parsed maps from a directory of .map files
+
+        Maps are parsed once and the parsed data is kept in a cache file
+        next to them, so later runs only re-parse maps that were changed.
+        Use load_corpus() to share one corpus between all rounds of a run.
+        A directory without maps raises ValueError.
+    """
+    def __init__(self, path, parse, cache_name='corpus'):
+        self.path = path
+        self.parse = parse
+        self.cache_path = os.path.join(path, '.%s.cache' % cache_name)
+        self.names = []
+        self.texts = {}
+        self.maps = {}
+        self.load()
+
+    def load(self):
+        cache = self.read_cache()
+        changed = False
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith('.map'):
+                continue
+            file_path = os.path.join(self.path, name)
+            stat = os.stat(file_path)
+            key = (stat.st_mtime, stat.st_size)
+            if name in cache and cache[name][0] == key:
+                _, text, map_data = cache[name]
+            else:
+                with open(file_path, 'r') as map_file:
+                    text = map_file.read()
+                map_data = self.parse(text)
+                cache[name] = (key, text, map_data)
+                changed = True
+            self.names.append(name)
+            self.texts[name] = text
+            self.maps[name] = map_data
+        for name in set(cache) - set(self.names):
+            del cache[name]
+            changed = True
+        if changed:
+            self.write_cache(cache)
+        if not self.names:
+            raise ValueError('no .map files in %s' % self.path)
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path, 'rb') as cache_file:
+                version, cache = pickle.load(cache_file)
+            if version == CACHE_VERSION:
+                return cache
+        except Exception:
+            pass  # missing or broken cache is rebuilt
+        return {}
+
+    def write_cache(self, cache):
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as cache_file:
+                pickle.dump((CACHE_VERSION, cache), cache_file,
+                            pickle.HIGHEST_PROTOCOL)
+            if os.path.exists(self.cache_path) and os.name == 'nt':
+                os.remove(self.cache_path)  # rename can't overwrite on windows
+            os.rename(tmp_path, self.cache_path)
+        except (IOError, OSError):
+            pass  # read-only map dir, cache is just not persisted
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, index):
+        ''' Map name, text and parsed data, cycling through the corpus '''
+        name = self.names[index % len(self.names)]
+        return name, self.texts[name], self.maps[name]
+
+
+def load_corpus(path, parse, cache_name='corpus'):
+    """ Load a map corpus once per process """
+    key = (os.path.realpath(path), cache_name)
+    if key not in _corpora:
+        _corpora[key] = MapCorpus(path, parse, cache_name)
+    return _corpora[key]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+PROFILERS = ('cprofile', 'sample')
+
+# file extension of the profile written by each profiler
+EXTENSIONS = {
+    'cprofile': '.pstats',  # for pstats, snakeviz, gprof2dot...
+    'sample': '.folded',    # collapsed stacks for flamegraph.pl, speedscope...
+}
+
+
+class Sampler(threading.Thread):
+    """ Low overhead sampling profiler
+
+        Every interval takes the stacks of all other threads, so sandbox
+        reader threads show up next to the engine and game logic.
+        Stacks are counted in the collapsed format used by flame graphs.
+    """
+    def __init__(self, interval=0.005):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.stopped = threading.Event()
+
+    def run(self):
+        own_id = threading.current_thread().ident
+        while not self.stopped.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[self.collapse(frame)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append('%s (%s:%d)' % (code.co_name,
+                                         os.path.basename(code.co_filename),
+                                         code.co_firstlineno))
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def dump_stats(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('%s %d\n' % (stack, count))
+
+
+def profile_path(log_dir, game_id, mode):
+    return os.path.join(log_dir or '.', '{0}{1}'.format(game_id, EXTENSIONS[mode]))
+
+
+def profile_call(mode, path, func, *args, **kwargs):
+    """ Run func under the given profiler and write its profile to path """
+    if mode == 'sample':
+        profiler = Sampler()
+        profiler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.stop()
+            profiler.dump_stats(path)
+    else:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            profiler.dump_stats(path)
+
+
+def summarize(paths, top=20):
+    """ Top hot functions across all profiles of a run """
+    pstats_paths = [p for p in paths if p.endswith(EXTENSIONS['cprofile'])]
+    folded_paths = [p for p in paths if p.endswith(EXTENSIONS['sample'])]
+    out = StringIO()
+
+    if pstats_paths:
+        stats = pstats.Stats(pstats_paths[0], stream=out)
+        for path in pstats_paths[1:]:
+            stats.add(path)
+        out.write('Top functions by own time in %d games\n' % len(pstats_paths))
+        stats.sort_stats('tottime').print_stats(top)
+
+    if folded_paths:
+        own = defaultdict(int)
+        total = 0
+        for path in folded_paths:
+            with open(path, 'r') as f:
+                for line in f:
+                    stack, count = line.rsplit(' ', 1)
+                    own[stack.rsplit(';', 1)[-1]] += int(count)
+                    total += int(count)
+        out.write('Top functions by own samples in %d games\n' % len(folded_paths))
+        out.write('%8s %7s  %s\n' % ('samples', 'percent', 'function'))
+        for function, count in sorted(own.items(), key=lambda x: -x[1])[:top]:
+            out.write('%8d %6.2f%%  %s\n' % (count, 100.0 * count / total, function))
+
+    return out.getvalue()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import json
+import os
+import traceback
+from multiprocessing import Pool
+from optparse import OptionParser
+
+
+def get_map_text(replaydata):
+    ''' Rebuild map file text from the map stored in a replay '''
+    lines = ['players %s' % replaydata['players'],
+             'rows %s' % replaydata['map']['rows'],
+             'cols %s' % replaydata['map']['cols']]
+    lines += ['m %s' % row for row in replaydata['map']['data']]
+    return '\n'.join(lines)
+
+
+def replay_game(game_class, result, options=None):
+    """ Re-simulate a game from its stored result, without bots
+
+        result is the game result written by the engine to a replay file.
+        Bots are killed on the turns the engine recorded for them,
+        all other orders are taken from the replay itself.
+        Returns the finished game and a list of detected problems.
+    """
+    replaydata = result['replaydata']
+    game_options = {
+        'map': get_map_text(replaydata),
+        'turns': replaydata['turns'],
+        'loadtime': replaydata.get('loadtime', 3000),
+        'turntime': replaydata.get('turntime', 1000),
+        'sim_steps': 500,
+        'engine_seed': replaydata.get('engine_seed', 0),
+        'player_seed': replaydata.get('player_seed', 0),
+    }
+    game_options.update(options or {})
+    # alive cells on the starting map are only allowed for scenarios
+    game_options.setdefault('scenario', any(
+        c not in '-0' for row in replaydata['map']['data'] for c in row))
+    game = game_class(game_options)
+
+    errors = []
+    status = result.get('status', ['survived'] * game.num_players)
+    playerturns = result.get('playerturns', [0] * game.num_players)
+    deaths = {}  # turn: players killed on it, several may die at once
+    for player, turns in enumerate(playerturns):
+        if status[player] != 'survived':
+            deaths.setdefault(turns, []).append(player)
+    orders = game.get_replay_orders(replaydata)
+
+    game.start_game()
+    turn = 0  # game of no turns
+    for turn in range(1, game.turns + 1):
+        game.start_turn()
+        for player in deaths.get(turn, []):
+            game.kill_player(player)
+        if not game.game_over():
+            for player, player_orders in orders.get(turn, []):
+                if not game.is_alive(player) or not game.is_his_turn(player):
+                    errors.append('turn %s: order of player %s out of turn'
+                                  % (turn, player))
+                    continue
+                player_orders, _, _, invalid = game.validate_orders(
+                    player, player_orders, player_orders, [], [])
+                for line, error in invalid:
+                    errors.append('turn %s: player %s order %s %s'
+                                  % (turn, player, line, error))
+                game.orders[player] = player_orders
+        game.finish_turn()
+        if game.game_over():
+            break
+    game.finish_game()
+
+    if 'score' in result and list(game.get_scores()) != list(result['score']):
+        errors.append('score %s, stored %s' % (game.get_scores(), result['score']))
+    if 'game_length' in result and turn != result['game_length']:
+        errors.append('game length %s, stored %s' % (turn, result['game_length']))
+    if replaydata.get('cutoff') and game.cutoff != replaydata['cutoff']:
+        errors.append('cutoff "%s", stored "%s"' % (game.cutoff, replaydata['cutoff']))
+    return game, errors
+
+
+def check_file(task):
+    ''' Verify a single replay file in a worker process '''
+    game_class, path, options = task
+    try:
+        with open(path, 'r') as replay_file:
+            result = json.load(replay_file)
+        _, errors = replay_game(game_class, result, options)
+    except Exception:
+        errors = [traceback.format_exc()]
+    return path, errors
+
+
+def find_replays(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.replay'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def check_files(game_class, paths, options=None, processes=None, chunksize=16):
+    """ Verify replay files in parallel, yields (path, errors) as they finish """
+    tasks = ((game_class, path, options) for path in find_replays(paths))
+    pool = Pool(processes)
+    try:
+        for path, errors in pool.imap_unordered(check_file, tasks, chunksize):
+            yield path, errors
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(game_class, argv):
+    usage = "Usage: %prog [options] replay_file_or_dir ..."
+    parser = OptionParser(usage=usage)
+    parser.add_option("-j", "--processes", dest="processes",
+                      default=None, type="int",
+                      help="Number of worker processes, defaults to number of cpus")
+    parser.add_option("--sim_steps", dest="sim_steps",
+                      default=None, type="int",
+                      help="Duration of the life simulation the games were played with")
+    parser.add_option("-q", "--quiet", dest="quiet",
+                      action="store_true", default=False,
+                      help="Only print the summary")
+    (opts, args) = parser.parse_args(argv)
+    if not args:
+        parser.print_help()
+        return -1
+
+    options = {}
+    if opts.sim_steps is not None:
+        options['sim_steps'] = opts.sim_steps
+
+    checked = failed = 0
+    for path, errors in check_files(game_class, args, options, opts.processes):
+        checked += 1
+        if errors:
+            failed += 1
+            if not opts.quiet:
+                print('%s: FAILED' % path)
+                for error in errors:
+                    print('    %s' % error)
+    print('%d replays checked, %d failed' % (checked, failed))
+    return 1 if failed else 0
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import itertools
+import json
+import math
+import os
+import traceback
+from multiprocessing import Pool
+
+from engine import run_game
+from profiling import profile_call, profile_path
+
+# Glicko rating system constants
+INITIAL_RATING = 1500.0
+INITIAL_DEVIATION = 350.0
+MIN_DEVIATION = 30.0
+Q = math.log(10) / 400
+
+SCHEDULERS = ('roundrobin', 'swiss', 'adaptive')
+
+
+def _g(deviation):
+    return 1 / math.sqrt(1 + 3 * (Q * deviation) ** 2 / math.pi ** 2)
+
+
+class Ratings(object):
+    """ Incrementally updated rating table for a pool of bots.
+
+        Every bot has a rating and a rating deviation (uncertainty),
+        both updated after each single game (Glicko-1 with a rating
+        period of one game). The table can be checkpointed to disk
+        and restored to continue a tournament.
+    """
+    def __init__(self, names):
+        self.names = list(names)
+        self.rating = dict((name, INITIAL_RATING) for name in self.names)
+        self.deviation = dict((name, INITIAL_DEVIATION) for name in self.names)
+        self.games = dict((name, 0) for name in self.names)
+        self.results = dict((name, [0, 0, 0]) for name in self.names)  # wins, draws, losses
+        self.played = set()  # unordered pairs of bots that already met
+
+    def expected(self, a, b):
+        """ Expected score of bot a against bot b """
+        g = _g(math.sqrt(self.deviation[a] ** 2 + self.deviation[b] ** 2))
+        return 1 / (1 + 10 ** (-g * (self.rating[a] - self.rating[b]) / 400))
+
+    def information(self, a, b):
+        """ How much a game between a and b is expected to tell us
+
+            Close matches between uncertain bots are the most informative.
+        """
+        e = self.expected(a, b)
+        return e * (1 - e) * (self.deviation[a] ** 2 + self.deviation[b] ** 2)
+
+    def update(self, a, b, score):
+        """ Record a game, score is 1 for a win of a, 0.5 for draw, 0 for loss """
+        new_a = self._updated(a, b, score)
+        new_b = self._updated(b, a, 1 - score)
+        self.rating[a], self.deviation[a] = new_a
+        self.rating[b], self.deviation[b] = new_b
+
+        for name, result in ((a, score), (b, 1 - score)):
+            self.games[name] += 1
+            self.results[name][int(2 - result * 2)] += 1
+        self.played.add(frozenset((a, b)))
+
+    def _updated(self, player, opponent, score):
+        g = _g(self.deviation[opponent])
+        e = 1 / (1 + 10 ** (-g * (self.rating[player] - self.rating[opponent]) / 400))
+        d2 = 1 / (Q ** 2 * g ** 2 * e * (1 - e))
+        precision = 1 / self.deviation[player] ** 2 + 1 / d2
+        rating = self.rating[player] + Q / precision * g * (score - e)
+        deviation = max(math.sqrt(1 / precision), MIN_DEVIATION)
+        return rating, deviation
+
+    def ranking(self):
+        return sorted(self.names, key=lambda name: -self.rating[name])
+
+    def is_stable(self, z=1.96):
+        """ Ranking is stable when every pair of neighbours in it is
+            separated by more than z standard deviations.
+        """
+        ranking = self.ranking()
+        for a, b in zip(ranking, ranking[1:]):
+            spread = math.sqrt(self.deviation[a] ** 2 + self.deviation[b] ** 2)
+            if self.rating[a] - self.rating[b] <= z * spread:
+                return False
+        return True
+
+    def to_dict(self):
+        return {
+            'names': self.names,
+            'rating': self.rating,
+            'deviation': self.deviation,
+            'games': self.games,
+            'results': self.results,
+            'played': sorted(sorted(pair) for pair in self.played),
+        }
+
+    @classmethod
+    def from_dict(cls, data, names):
+        ratings = cls(names)
+        for name in names:
+            if name in data['names']:
+                ratings.rating[name] = data['rating'][name]
+                ratings.deviation[name] = data['deviation'][name]
+                ratings.games[name] = data['games'][name]
+                ratings.results[name] = data['results'][name]
+        ratings.played = set(frozenset(pair) for pair in data['played']
+                             if set(pair) <= set(names))
+        return ratings
+
+    def save(self, path):
+        """ Checkpoint the table, never leaving a half written file behind """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, sort_keys=True, indent=1)
+        if os.path.exists(path) and os.name == 'nt':
+            os.remove(path)  # rename can't overwrite on windows
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, names):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f), names)
+
+    def table(self):
+        lines = ['{0:>4} {1:<30} {2:>7} {3:>5} {4:>5} {5:>12}'.format(
+            'rank', 'bot', 'rating', 'dev', 'games', 'w/d/l')]
+        for rank, name in enumerate(self.ranking(), 1):
+            lines.append('{0:>4} {1:<30} {2:>7.1f} {3:>5.1f} {4:>5} {5:>12}'.format(
+                rank, name, self.rating[name], self.deviation[name],
+                self.games[name], '/'.join(map(str, self.results[name]))))
+        return '\n'.join(lines)
+
+
+def roundrobin_pairings(names, cycle):
+    """ Every pair of bots once, seats are swapped on odd cycles """
+    pairs = list(itertools.combinations(names, 2))
+    if cycle % 2:
+        pairs = [(b, a) for a, b in pairs]
+    return pairs
+
+
+def swiss_pairings(ratings, cycle):
+    """ Pair neighbours in the current ranking, avoiding rematches when possible """
+    pool = ratings.ranking()
+    pairs = []
+    while len(pool) > 1:
+        a = pool.pop(0)
+        opponent = next((b for b in pool
+                         if frozenset((a, b)) not in ratings.played), pool[0])
+        pool.remove(opponent)
+        pairs.append((a, opponent) if cycle % 2 else (opponent, a))
+    return pairs
+
+
+def adaptive_pairings(ratings, count):
+    """ Pick up to count disjoint pairs with the highest expected information """
+    candidates = sorted(itertools.permutations(ratings.names, 2),
+                        key=lambda pair: -ratings.information(*pair))
+    busy = set()
+    pairs = []
+    for a, b in candidates:
+        if a in busy or b in busy:
+            continue
+        # let the bot with fewer games take the first seat
+        if ratings.games[a] > ratings.games[b]:
+            a, b = b, a
+        pairs.append((a, b))
+        busy.update((a, b))
+        if len(pairs) >= count:
+            break
+    return pairs
+
+
+def play_match(task):
+    ''' Play a single game in a worker process '''
+    game_class, game_options, engine_options, pair, bots, replay_path, profile = task
+    try:
+        game = game_class(game_options)
+        if replay_path:
+            engine_options = dict(engine_options, replay_log=open(replay_path, 'w'))
+        if profile:
+            result = profile_call(profile[0], profile[1],
+                                  run_game, game, bots, engine_options)
+        else:
+            result = run_game(game, bots, engine_options)
+        if engine_options.get('replay_log'):
+            engine_options['replay_log'].close()
+    except Exception:
+        result = {'error': traceback.format_exc()}
+    return pair, engine_options['game_id'], result
+
+
+def match_score(result):
+    """ Score of the first seat: 1 for a win, 0.5 for a draw, 0 for a loss """
+    scores = result['score']
+    if scores[0] > scores[1]:
+        return 1
+    elif scores[0] < scores[1]:
+        return 0
+    return 0.5
+
+
+def run_tournament(game_class, game_options, engine_options, bots, opts, log=None):
+    """ Run games between a pool of bots until the ranking is stable
+
+        bots is a list of (name, (working dir, command)) tuples.
+        opts holds the tournament settings: tournament (scheduler name),
+        concurrency, max_games, ratings_file, log_dir, game_id and
+        profile, profiler, profile_every for profiling every Nth game.
+        Returns the ratings and paths of the written profiles.
+    """
+    names = [name for name, _ in bots]
+    if len(set(names)) != len(names):
+        raise Exception("tournament", "bot names must be unique: %s" % names)
+    commands = dict(bots)
+
+    if opts.ratings_file and os.path.exists(opts.ratings_file):
+        ratings = Ratings.load(opts.ratings_file, names)
+    else:
+        ratings = Ratings(names)
+
+    pool = Pool(opts.concurrency)
+    game_id = opts.game_id
+    games_played = cycle = 0
+    prof_paths = []
+    try:
+        while games_played < opts.max_games:
+            if opts.tournament == 'roundrobin':
+                pairs = roundrobin_pairings(names, cycle)
+            elif opts.tournament == 'swiss':
+                pairs = swiss_pairings(ratings, cycle)
+            else:
+                pairs = adaptive_pairings(ratings, opts.concurrency)
+            pairs = pairs[:opts.max_games - games_played]
+            cycle += 1
+
+            tasks = []
+            for pair in pairs:
+                replay_path = None
+                if opts.log_dir:
+                    replay_path = os.path.join(opts.log_dir, '{0}.replay'.format(game_id))
+                profile = None
+                if opts.profile and (game_id - opts.game_id) % opts.profile_every == 0:
+                    profile = (opts.profiler,
+                               profile_path(opts.log_dir, game_id, opts.profiler))
+                    prof_paths.append(profile[1])
+                tasks.append((game_class, game_options,
+                              dict(engine_options, game_id=game_id),
+                              pair, [commands[name] for name in pair],
+                              replay_path, profile))
+                game_id += 1
+
+            for pair, match_id, result in pool.imap_unordered(play_match, tasks):
+                games_played += 1
+                if 'error' in result:
+                    if log:
+                        log.write('game {0} {1} failed:\n{2}\n'.format(
+                            match_id, ' vs '.join(pair), result['error']))
+                    continue
+                ratings.update(pair[0], pair[1], match_score(result))
+                if opts.ratings_file:
+                    ratings.save(opts.ratings_file)
+                if log:
+                    log.write('game {0} {1} score {2}\n'.format(
+                        match_id, ' vs '.join(pair),
+                        ' '.join(map(str, result['score']))))
+
+            if opts.tournament != 'roundrobin' and ratings.is_stable():
+                break
+    finally:
+        pool.close()
+        pool.join()
+
+    if log:
+        log.write('{0} games played, ranking is {1}stable\n'.format(
+            games_played, '' if ratings.is_stable() else 'not '))
+        log.write(ratings.table() + '\n')
+    return ratings, prof_paths